@@ -0,0 +1,144 @@
+import argparse, json, os, re, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import ingest_docs
+from data_structure_agent import build_llm, create_structure_json, load_retriever
+
+
+# Batch mode: many BRDs -> one shared KB -> one output folder per Request Offering.
+#
+# Manifest is either a directory (every *.docx in it is a BRD) or a JSON file:
+#   [ "path/to/A.docx", {"brd": "path/to/B.docx", "name": "vpn_access"} ]
+# Relative paths in a JSON manifest are resolved against the manifest's folder.
+
+
+def slugify(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_") or "offering"
+
+
+def read_manifest(manifest):
+    manifest = Path(manifest)
+    if manifest.is_dir():
+        entries = [{"brd": p} for p in sorted(manifest.glob("*.docx")) if not p.name.startswith("~$")]
+    else:
+        with manifest.open("r", encoding="utf-8") as f:
+            raw = json.load(f)
+        entries = []
+        for item in raw:
+            item = {"brd": item} if isinstance(item, str) else dict(item)
+            brd = Path(item["brd"])
+            item["brd"] = brd if brd.is_absolute() else manifest.parent / brd
+            entries.append(item)
+
+    jobs, names, sources = [], set(), set()
+    for e in entries:
+        brd = Path(e["brd"])
+        name = slugify(e.get("name") or brd.stem)
+        # chunks are filtered by file name in the shared KB, so two BRDs can't share one
+        if brd.name in sources:
+            raise ValueError(f"Two BRDs named {brd.name} in manifest; rename one.")
+        if name in names:
+            raise ValueError(f"Duplicate offering name in manifest: {name}")
+        sources.add(brd.name)
+        names.add(name)
+        jobs.append({"name": name, "brd": brd})
+
+    if not jobs:
+        raise FileNotFoundError(f"No BRDs found in {manifest}")
+    return jobs
+
+
+def ingest_batch(jobs, pdf_path=ingest_docs.pdf_path, rebuild=False, kb_path=ingest_docs.PERSIST_DIR):
+    # one KB for everything: the vendor PDF once, plus every BRD (incremental, so unchanged BRDs cost nothing)
+    paths = [pdf_path] + [j["brd"] for j in jobs]
+    ingest_docs.main_grounding_data(rebuild=rebuild, incremental=not rebuild, paths=paths, persist_dir=kb_path)
+
+
+def run_job(job, retriever, llm, out_root, pdf_name, retries, bucket_workers, token_budget):
+    out_dir = os.path.join(out_root, job["name"])
+    where = {"source": {"$in": [pdf_name, job["brd"].name]}}   # this BRD + the shared vendor doc
+
+    last_err = None
+    for attempt in range(1, retries + 2):
+        try:
+            start = time.perf_counter()
+            create_structure_json(
+                out_dir=out_dir,
+                retriever=retriever,
+                llm=llm,
+                where=where,
+                source_docs=[job["brd"].name],
+                max_workers=bucket_workers,
+                token_budget=token_budget,
+            )
+            return {"name": job["name"], "brd": str(job["brd"]), "status": "ok",
+                    "attempts": attempt, "seconds": round(time.perf_counter() - start, 2), "out_dir": out_dir}
+        except Exception as e:
+            last_err = e
+            if attempt <= retries:
+                time.sleep(min(2 ** attempt, 30))
+
+    return {"name": job["name"], "brd": str(job["brd"]), "status": "failed",
+            "attempts": retries + 1, "error": f"{type(last_err).__name__}: {last_err}"}
+
+
+def run_batch(manifest, out_root="structured_batch", kb_path=ingest_docs.PERSIST_DIR, pdf_path=ingest_docs.pdf_path,
+              workers=4, retries=2, bucket_workers=1, k=10, model="gpt-4o-mini", token_budget=None,
+              ingest=True, rebuild=False):
+    jobs = read_manifest(manifest)
+    os.makedirs(out_root, exist_ok=True)
+
+    if ingest:
+        ingest_batch(jobs, pdf_path, rebuild=rebuild, kb_path=kb_path)
+
+    # one retriever and one LLM client for the whole run
+    retriever = load_retriever(kb_path, "ivanti_kb", k=k)
+    llm = build_llm(model)
+
+    start = time.perf_counter()
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_job, job, retriever, llm, out_root, Path(pdf_path).name,
+                               retries, bucket_workers, token_budget) for job in jobs]
+        for fut in as_completed(futures):
+            r = fut.result()
+            results.append(r)
+            print(f"[{r['status']}] {r['name']}" + (f" ({r['error']})" if r["status"] != "ok" else ""))
+    elapsed = time.perf_counter() - start
+
+    ok = sum(1 for r in results if r["status"] == "ok")
+    report = {
+        "offerings": len(jobs),
+        "ok": ok,
+        "failed": len(jobs) - ok,
+        "seconds": round(elapsed, 2),
+        "offerings_per_minute": round(ok / elapsed * 60, 2) if elapsed > 0 else None,
+        "jobs": sorted(results, key=lambda r: r["name"]),
+    }
+    with open(os.path.join(out_root, "_batch_report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"{ok}/{len(jobs)} offerings in {elapsed:.1f}s ({report['offerings_per_minute']} offerings/min)")
+    return report
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Extract many BRDs into many Request Offerings.")
+    ap.add_argument("manifest", help="folder of BRD .docx files or a JSON manifest")
+    ap.add_argument("--out", default="structured_batch")
+    ap.add_argument("--pdf", default=str(ingest_docs.pdf_path), help="shared vendor documentation PDF")
+    ap.add_argument("--kb", default=ingest_docs.PERSIST_DIR, help="Chroma persist dir that is filled and queried")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--retries", type=int, default=2)
+    ap.add_argument("--bucket-workers", type=int, default=1, help="concurrent buckets inside one offering")
+    ap.add_argument("--token-budget", type=int, default=None)
+    ap.add_argument("--model", default="gpt-4o-mini")
+    ap.add_argument("--skip-ingest", action="store_true")
+    ap.add_argument("--rebuild", action="store_true")
+    a = ap.parse_args()
+
+    report = run_batch(a.manifest, out_root=a.out, kb_path=a.kb, pdf_path=Path(a.pdf), workers=a.workers, retries=a.retries,
+                       bucket_workers=a.bucket_workers, model=a.model, token_budget=a.token_budget,
+                       ingest=not a.skip_ingest, rebuild=a.rebuild)
+    raise SystemExit(1 if report["failed"] else 0)
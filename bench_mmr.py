@@ -0,0 +1,65 @@
+"""
+MMR benchmark: mmr.mmr_batch against per-query MMR on synthetic embeddings.  Run from the repo root:
+
+    python bench_mmr.py
+"""
+import time
+
+from mmr import mmr_batch
+
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def _mmr_per_query(query, cands, k, lambda_mult):
+    """langchain_core.vectorstores.utils.maximal_marginal_relevance, one query at a time (the old path)."""
+    import numpy as np
+
+    def cos(a, b):
+        a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+        b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+        return a @ b.T
+
+    rel = cos(query[None, :], cands)[0]
+    picked = [int(rel.argmax())]
+    while len(picked) < min(k, len(cands)):
+        redundancy = cos(cands, cands[picked]).max(axis=1)
+        score = lambda_mult * rel - (1 - lambda_mult) * redundancy
+        score[picked] = -np.inf
+        picked.append(int(score.argmax()))
+    return picked
+
+
+def bench_mmr():
+    import numpy as np
+
+    # load_retriever's settings: k=12, fetch_k=80, lambda_mult=0.2; candidates overlap across a bucket's queries
+    k, fetch_k, lam, dim = 12, 80, 0.2, 1536
+    rng = np.random.default_rng(0)
+    print(f"MMR for one bucket, k={k} fetch_k={fetch_k} lambda={lam} dim={dim} (best of 3)")
+    print(f"{'queries':>8} {'pool':>6} {'per-query ms':>13} {'vectorized ms':>14} {'same picks':>11}")
+    for nq, pool in ((10, 200), (20, 300), (40, 600)):
+        vecs = rng.standard_normal((pool, dim)).astype(np.float32)
+        ids = [f"c{i}" for i in range(pool)]
+        by_id = dict(zip(ids, vecs))
+        queries = rng.standard_normal((nq, dim)).astype(np.float32)
+        cands = [[ids[j] for j in rng.choice(pool, fetch_k, replace=False)] for _ in range(nq)]
+
+        def per_query():
+            return [[c[j] for j in _mmr_per_query(q, np.stack([by_id[cid] for cid in c]), k, lam)]
+                    for q, c in zip(queries, cands)]
+
+        t_old = timed(per_query)
+        t_new = timed(mmr_batch, queries, cands, by_id, k, lam)
+        same = per_query() == mmr_batch(queries, cands, by_id, k, lam)
+        print(f"{nq:>8} {pool:>6} {t_old * 1e3:>13.2f} {t_new * 1e3:>14.2f} {str(same):>11}")
+
+
+if __name__ == "__main__":
+    bench_mmr()
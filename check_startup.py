@@ -0,0 +1,69 @@
+import argparse, subprocess, sys, time
+from pathlib import Path
+
+
+# Import-time budget for the non-LLM entry points (CI gate):
+#
+#     python check_startup.py            # exit code 1 when an entry point is over budget or fails to import
+#
+# Each entry point is imported in a fresh `python -X importtime` (best of --runs, interpreter start excluded).
+# It is over budget when it takes longer than --budget-ms or loads any of the LangChain / Chroma / OpenAI stack,
+# which must only be imported inside the functions that use it.
+
+ROOT = Path(__file__).resolve().parent
+BUDGET_MS = 200
+CASES = [   # (name, working dir, code)
+    ("data_structure_agent", ROOT, "import data_structure_agent as m; m.minimal_normalize_offering(m.json_only('{}') or {})"),
+    ("ingest_docs", ROOT, "import ingest_docs"),
+    ("llm_cache", ROOT, "import llm_cache"),
+    ("batch_validate", ROOT / "translate_to_Ivanti", "import batch_validate"),
+]
+HEAVY = ("langchain", "langchain_core", "langchain_openai", "langchain_chroma", "langchain_community", "chromadb", "openai")
+
+
+def import_profile(code: str, cwd: Path):
+    """(wall ms, {top-level module: cumulative import ms}) for `python -X importtime -c code`."""
+    t = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=cwd, capture_output=True, text=True)
+    wall = (time.perf_counter() - t) * 1e3
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    mods = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cum, name = line.split("|")
+        if cum.strip().isdigit() and not name.startswith("  "):   # top-level imports only
+            mods[name.strip()] = int(cum) / 1e3
+    return wall, mods
+
+
+def run(budget_ms: float = BUDGET_MS, runs: int = 5) -> int:
+    """Prints one line per entry point; returns the number that failed or went over budget."""
+    base = min(import_profile("pass", ROOT)[0] for _ in range(3))
+    print(f"cold start of the non-LLM paths (python -X importtime, best of {runs}, interpreter start {base:.0f} ms excluded)")
+    print(f"{'entry point':<22} {'ms':>7} {'budget':>7}  heaviest imports")
+    bad = 0
+    for name, cwd, code in CASES:
+        try:
+            profiles = [import_profile(code, cwd) for _ in range(runs)]
+        except RuntimeError as e:
+            bad += 1
+            print(f"{name:<22} {'-':>7} {'FAIL':>7}  {e}")
+            continue
+        wall, mods = min(profiles, key=lambda r: r[0])
+        heavy = sorted(m for m in mods if m.split(".")[0] in HEAVY)
+        over = wall - base > budget_ms or bool(heavy)
+        bad += over
+        top = ", ".join(f"{m} {ms:.0f}" for m, ms in sorted(mods.items(), key=lambda kv: -kv[1])[:3])
+        print(f"{name:<22} {wall - base:>7.1f} {'OVER' if over else 'ok':>7}  {top}"
+              + (f"  [loads {', '.join(heavy)}]" if heavy else ""))
+    return bad
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Fail when a non-LLM entry point imports too slowly or loads the LLM stack.")
+    ap.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    ap.add_argument("--runs", type=int, default=5, help="imports per entry point; the fastest counts")
+    a = ap.parse_args()
+    sys.exit(1 if run(a.budget_ms, a.runs) else 0)
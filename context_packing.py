@@ -0,0 +1,92 @@
+import re
+from functools import lru_cache
+
+EXACT_RE = re.compile(r'^exact:"(.+)"$')
+RRF_K = 60          # standard reciprocal-rank-fusion damping
+LABEL_WEIGHT = 0.02  # one label hit is worth about a top-10 rank in a single query
+MIN_OVERLAP = 20     # shorter suffix/prefix matches are treated as coincidence, not splitter overlap
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    enc = _encoder()
+    if enc is None:
+        return len(text) // 4 + 1   # rough chars-per-token for English when tiktoken is missing
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def exact_labels(queries):
+    return [m.group(1) for m in (EXACT_RE.match(q) for q in queries) if m]
+
+
+def content_key(d):
+    return (d.metadata.get("source"), d.metadata.get("page"), (d.page_content or "")[:60])
+
+
+def doc_key(d):
+    """The vector id when the chunk has one (retrieve_batch results), else the content key."""
+    return getattr(d, "id", None) or content_key(d)
+
+
+def overlap_len(a: str, b: str, max_overlap: int = 400) -> int:
+    """Length of the longest suffix of a that is also a prefix of b (the splitter's chunk_overlap region)."""
+    top = min(len(a), len(b), max_overlap)
+    for n in range(top, MIN_OVERLAP - 1, -1):
+        if a.endswith(b[:n]):
+            return n
+    return 0
+
+
+def rank_docs(per_query_docs, labels, key=doc_key):
+    """Score each unique chunk by reciprocal rank across queries plus exact-label hits; best first."""
+    scores, docs = {}, {}
+    for res in per_query_docs:
+        for rank, d in enumerate(res):
+            kd = key(d)
+            docs.setdefault(kd, d)
+            scores[kd] = scores.get(kd, 0.0) + 1.0 / (RRF_K + rank + 1)
+
+    low_labels = [lab.lower() for lab in labels]
+    for kd, d in docs.items():
+        text = (d.page_content or "").lower()
+        scores[kd] += LABEL_WEIGHT * sum(1 for lab in low_labels if lab in text)
+
+    return [docs[kd] for kd in sorted(docs, key=lambda k: scores[k], reverse=True)]
+
+
+def pack_context(per_query_docs, token_budget, labels=(), header=lambda d: "", key=doc_key):
+    """
+    Greedy packing of ranked chunks into token_budget tokens.
+    Text that a chunk shares with an already-packed neighbour from the same page is cut, so the
+    200-char splitter overlap is only paid once. Returns [(doc, text)] in ranked order.
+    """
+    picked, used = [], 0
+    by_page = {}
+    for d in rank_docs(per_query_docs, labels, key):
+        text = d.page_content or ""
+        page = (d.metadata.get("source"), d.metadata.get("page"))
+        for other in by_page.get(page, []):
+            n = overlap_len(other, text)
+            if n:
+                text = text[n:]
+            n = overlap_len(text, other)
+            if n:
+                text = text[:-n]
+        if not text.strip():
+            continue
+
+        cost = count_tokens(header(d) + "\n" + text)
+        if used + cost > token_budget:
+            continue   # a shorter chunk further down may still fit
+        used += cost
+        picked.append((d, text))
+        by_page.setdefault(page, []).append(d.page_content or "")
+    return picked
@@ -1,9 +1,12 @@
 import os,json
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
+from context_packing import EXACT_RE, content_key, doc_key, exact_labels, pack_context
+from llm_cache import CachedChat, LLMCache, CACHE_PATH as LLM_CACHE_PATH
 from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+# langchain_openai / langchain_chroma (and the embedding client) are imported inside the functions that
+# use them: they cost seconds at import time, and json_only / minimal_normalize_offering / the caches don't need them.
 
 
 load_dotenv()
@@ -75,43 +78,156 @@ APPROVED = {
   ]
 }
 MAX_FOLLOWUPS = 2
+COVERAGE_THRESHOLD = 0.8   # share of a bucket's exact:"..." labels that must show up in context to skip the gap-check LLM call
 
 
-def load_retriever(kb_path: str, collection: str = "ivanti_kb", k: int = 12):
-    vs = Chroma(
-        collection_name= collection,
-        embedding_function=OpenAIEmbeddings(model="text-embedding-3-small"),
-        persist_directory=kb_path
-    )
+def load_retriever(kb_path: str, collection: str = "ivanti_kb", k: int = 12, embed_backend=None, embed_model=None):
+    from embedding_backends import open_store
+
+    # raises KBMismatchError if the KB was built with another embedding model
+    vs = open_store(kb_path, collection, embed_backend, embed_model)
     return vs.as_retriever(
         search_type="mmr", 
         search_kwargs={"k": k, "fetch_k": 80, "lambda_mult": 0.2}
         )
 
 
-def get_context(retriever, queries, max_docs=20):
-    docs = []
-    for q in queries:
-        res = retriever.invoke(q)
-        docs.extend(res)
+def retrieve_batch(retriever, queries, where=None, lexical=None, vectorized=True):
+    """
+    Same results as [retriever.invoke(q) for q in queries] for a Chroma similarity/MMR retriever, but
+    all queries are embedded in one request and searched in one collection.query call.
+    vectorized=True (MMR only) fetches the union of the queries' candidates once and runs MMR for all
+    queries together on one candidate matrix (mmr.mmr_batch); False runs langchain's MMR per query.
+    where overrides the retriever's metadata filter (used to scope a shared KB to one BRD).
+
+    When the KB has a BM25 index (lexical_index, built at ingest), exact:"..." queries are answered from it
+    without embedding, and free-text results are the reciprocal-rank fusion of the vector and BM25 rankings.
+    """
+    import numpy as np
+    from langchain_core.documents import Document
+    from langchain_core.vectorstores.utils import maximal_marginal_relevance
+    from lexical_index import fuse, open_index
+    from mmr import mmr_batch
+
+    vs = retriever.vectorstore
+    kw = retriever.search_kwargs
+    mmr = retriever.search_type == "mmr"
+    k = kw.get("k", 4)
+    n = kw.get("fetch_k", 20) if mmr else k
+    flt = where if where is not None else kw.get("filter")
+    queries = list(queries)
+
+    if lexical is None and getattr(vs, "_persist_directory", None):
+        lexical = open_index(vs._persist_directory)
+
+    def lexical_hits(q):
+        try:
+            return [cid for cid, _ in lexical.query(q, k, flt)]
+        except NotImplementedError:   # a where filter the index can't evaluate -> vector only
+            return None
+
+    def lexical_doc(cid):
+        text, meta = lexical.get(cid)
+        return Document(page_content=text, metadata=meta, id=cid)
+
+    out = [None] * len(queries)
+    if lexical is not None:
+        for qi, q in enumerate(queries):
+            if EXACT_RE.match(q):
+                hits = lexical_hits(q)
+                if hits:   # label not in the KB -> fall back to the embedding search below
+                    out[qi] = [lexical_doc(cid) for cid in hits]
+
+    rest = [qi for qi, r in enumerate(out) if r is None]
+    if not rest:
+        return out
+
+    vectors = vs.embeddings.embed_documents([queries[qi] for qi in rest])
+    if mmr and vectorized:
+        # ids only per query, then the bucket's candidate union in one get: a chunk that is a candidate
+        # for several queries is fetched (and held as a vector) once
+        res = vs._collection.query(query_embeddings=vectors, n_results=n, where=flt, include=["distances"])
+        union = list(dict.fromkeys(cid for ids in res["ids"] for cid in ids))
+        got = vs._collection.get(ids=union, include=["documents", "metadatas", "embeddings"]) if union else {
+            "ids": [], "documents": [], "metadatas": [], "embeddings": []}
+        rows = {cid: j for j, cid in enumerate(got["ids"])}
+        picks = mmr_batch(vectors, res["ids"], {cid: got["embeddings"][j] for cid, j in rows.items()},
+                          k=k, lambda_mult=kw.get("lambda_mult", 0.5))
+        per_rest = [[(cid, got["documents"][rows[cid]], got["metadatas"][rows[cid]]) for cid in p] for p in picks]
+    else:
+        res = vs._collection.query(
+            query_embeddings=vectors,
+            n_results=n,
+            where=flt,
+            include=["documents", "metadatas", "embeddings"],
+        )
+        per_rest = []
+        for ri, vec in enumerate(vectors):
+            ids = res["ids"][ri]
+            texts = res["documents"][ri]
+            metas = res["metadatas"][ri]
+            if mmr and texts:
+                picked = maximal_marginal_relevance(
+                    np.array(vec, dtype=np.float32), res["embeddings"][ri],
+                    k=k, lambda_mult=kw.get("lambda_mult", 0.5),
+                )
+            else:
+                picked = range(min(k, len(texts)))
+            per_rest.append([(ids[j], texts[j], metas[j]) for j in picked])
+
+    for qi, picked in zip(rest, per_rest):
+        docs = {cid: Document(page_content=text, metadata=meta or {}, id=cid) for cid, text, meta in picked}
+
+        hits = lexical_hits(queries[qi]) if lexical is not None else None
+        if hits:
+            out[qi] = [docs[cid] if cid in docs else lexical_doc(cid) for cid in fuse([list(docs), hits], k)]
+        else:
+            out[qi] = list(docs.values())
+    return out
+
+
+def source_header(d):
+    return f"[SOURCE: {d.metadata.get('source')} | PAGE: {d.metadata.get('page')}]"
+
+
+def get_context(retriever, queries, max_docs=20, batched=True, token_budget=None, where=None, dedupe="id"):
+    """
+    Retrieve for every query and join the chunks with source headers.
+    token_budget=None keeps the first max_docs unique chunks; with a budget the chunks are ranked
+    (retrieval rank + exact-label hits), de-overlapped per page and packed until the budget is used.
+    dedupe="id" treats chunks as the same when they have the same vector id (falling back to the
+    content key for documents without one); dedupe="content" uses (source, page, first 60 chars).
+    """
+    if dedupe not in ("id", "content"):
+        raise ValueError(f"dedupe must be 'id' or 'content', got {dedupe!r}")
+    key = doc_key if dedupe == "id" else content_key
+    # retrievers that aren't backed by a Chroma store (or use thresholds) go through the plain per-query loop
+    can_batch = (batched and queries
+                 and hasattr(getattr(retriever, "vectorstore", None), "_collection")
+                 and getattr(retriever, "search_type", None) in ("mmr", "similarity"))
+
+    if can_batch:
+        per_query = retrieve_batch(retriever, queries, where=where)
+    else:
+        extra = {"filter": where} if where is not None else {}
+        per_query = [retriever.invoke(q, **extra) for q in queries]
+
+    if token_budget is not None:
+        picked = pack_context(per_query, token_budget, exact_labels(queries), header=source_header, key=key)
+        return "\n\n---\n\n".join(source_header(d) + "\n" + text for d, text in picked)
 
     uniq, seen = [], set()
-    for d in docs:
-        src = d.metadata.get("source")
-        page = d.metadata.get("page")
-        key = (src, page, (d.page_content or "")[:60])
-        if key not in seen:
-            seen.add(key)
+    for d in (d for res in per_query for d in res):
+        kd = key(d)
+        if kd not in seen:
+            seen.add(kd)
             uniq.append(d)
         if len(uniq) >= max_docs:
             break
 
     parts = [] # so this for make header or explain number page as example for the LLM later
     for d in uniq:
-        src = d.metadata.get("source")
-        page = d.metadata.get("page")
-        header = f"[SOURCE: {src} | PAGE: {page}]"
-        parts.append(header + "\n" + d.page_content)
+        parts.append(source_header(d) + "\n" + d.page_content)
     return "\n\n---\n\n".join(parts)
 
 
@@ -149,17 +265,41 @@ def check_gap_result(llm , bucket ,context_v1):
 
 
 
-def complete_extract_data(retriever, base_queries , llm , bucket, system_prompt, user_prompt):
+def label_coverage(context, queries):
+    """Which exact:"..." labels from queries occur (case-insensitive) in context -> (ratio or None, missing labels)."""
+    labels = exact_labels(queries)
+    if not labels:
+        return None, []
+    low = context.lower()
+    missing = [lab for lab in labels if lab.lower() not in low]
+    return 1 - len(missing) / len(labels), missing
+
+
+
+
+def complete_extract_data(retriever, base_queries , llm , bucket, system_prompt, user_prompt,
+                          coverage_threshold=COVERAGE_THRESHOLD, token_budget=None, where=None):
+
+    context = get_context(retriever ,base_queries , max_docs=20, token_budget=token_budget, where=where)
+    coverage, missing_labels = label_coverage(context, base_queries)
 
-    context = get_context(retriever ,base_queries , max_docs=20)
     if len(context) < 200:  
         gap = {"enough": False, "why": "context too short", "followups": APPROVED[bucket][:MAX_FOLLOWUPS]}
+        gap_check = "short_context"
+    elif coverage is not None and coverage >= coverage_threshold:
+        # the labels the extractor needs are already in context, no need to ask the LLM
+        gap = {"enough": True, "why": f"label coverage {coverage:.2f}", "followups": []}
+        gap_check = "local"
     else:
         gap = check_gap_result(llm, bucket , context)
+        gap_check = "llm"
 
     
     if not gap.get("enough") and gap.get("followups"):
-        context2_iteration = get_context(retriever , gap["followups"], max_docs=10)
+        # follow-ups get half the budget, same ratio as max_docs 20 -> 10
+        context2_iteration = get_context(retriever , gap["followups"], max_docs=10,
+                                         token_budget=None if token_budget is None else token_budget // 2,
+                                         where=where)
         final_context = context +  ("\n\n---\n\n" + context2_iteration)
     else:
         final_context = context
@@ -172,7 +312,10 @@ def complete_extract_data(retriever, base_queries , llm , bucket, system_prompt,
 
     raw = llm.invoke(messages).content
     return raw, {"followup_used": (not gap.get("enough")) and bool(gap.get("followups")),
-                 "why": gap.get("why"), "followups": gap.get("followups", [])}
+                 "why": gap.get("why"), "followups": gap.get("followups", []),
+                 "gap_check": gap_check,
+                 "label_coverage": None if coverage is None else round(coverage, 3),
+                 "missing_labels": missing_labels}
         
 
 
@@ -221,14 +364,63 @@ def minimal_normalize_offering(offering: dict) -> dict:
 
 
 
-def create_structure_json(kb_path="kb/chroma_ivanti", out_dir="structured", k=10, model="gpt-4o-mini"):
+def run_buckets(retriever, llm, jobs, max_workers=1, token_budget=None, where=None):
+    """
+    Run complete_extract_data for every bucket in jobs ({bucket: (queries, system_prompt, user_prompt)}).
+    max_workers > 1 runs up to that many buckets at once on a thread pool (the work is network bound).
+    Returns {bucket: (raw, meta)}.
+    """
+    def run(bucket):
+        queries, system_prompt, user_prompt = jobs[bucket]
+        return complete_extract_data(
+            retriever=retriever,
+            base_queries=queries,
+            llm=llm,
+            bucket=bucket,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            token_budget=token_budget,
+            where=where,
+        )
+
+    if max_workers <= 1:
+        return {bucket: run(bucket) for bucket in jobs}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {bucket: pool.submit(run, bucket) for bucket in jobs}
+        return {bucket: fut.result() for bucket, fut in futures.items()}
+
+
+
+
+def build_llm(model="gpt-4o-mini", use_llm_cache=True, llm_cache_path=LLM_CACHE_PATH):
+    from langchain_openai import ChatOpenAI
+
+    llm = ChatOpenAI(model=model , temperature=0)
+    # temperature=0 -> same prompt, same answer; reruns on an unchanged KB are served from disk
+    # (use_llm_cache=False forces fresh calls)
+    if use_llm_cache:
+        llm = CachedChat(llm, f"{model}@t0", LLMCache(llm_cache_path))
+    return llm
+
+
+
+
+def create_structure_json(kb_path="kb/chroma_ivanti", out_dir="structured", k=10, model="gpt-4o-mini", max_workers=1,
+                          use_llm_cache=True, llm_cache_path=LLM_CACHE_PATH, token_budget=None,
+                          retriever=None, llm=None, where=None, source_docs=None):
+    """
+    retriever / llm let a caller (batch_extract) share one client across many offerings;
+    where scopes retrieval to one BRD's chunks and source_docs is what gets recorded in the output files.
+    """
     
-    assert os.path.exists(kb_path), f"KB not found at {kb_path}. Run ingest first."
+    assert retriever is not None or os.path.exists(kb_path), f"KB not found at {kb_path}. Run ingest first."
     os.makedirs(out_dir , exist_ok=True)
 
-    llm_brain = ChatOpenAI(model=model , temperature=0)
+    llm_brain = llm if llm is not None else build_llm(model, use_llm_cache, llm_cache_path)
+    source_docs = source_docs or ["Request Offering BRD.docx"]
 
-    retriever_data = load_retriever(kb_path, "ivanti_kb", k=k)
+    retriever_data = retriever if retriever is not None else load_retriever(kb_path, "ivanti_kb", k=k)
 
 
 
@@ -549,15 +741,19 @@ def create_structure_json(kb_path="kb/chroma_ivanti", out_dir="structured", k=10
 
     
 
-    offering_raw, offering_meta = complete_extract_data(
-        retriever=retriever_data,
-        base_queries=base_offering,
-        llm=llm_brain,
-        bucket="offering",
-        system_prompt=OFFERING_SYS,
-        user_prompt=OFFERING_USER,
-    )
-    
+    # the three buckets only meet again when form.json is assembled, so they can run side by side
+    jobs = {
+        "offering": (base_offering, OFFERING_SYS, OFFERING_USER),
+        "fields":   (base_fields,   FIELDS_SYS,   FIELDS_USER),
+        "workflow": (base_workflow, WORKFLOW_SYS, WORKFLOW_USER),
+    }
+    results = run_buckets(retriever_data, llm_brain, jobs, max_workers=max_workers,
+                          token_budget=token_budget, where=where)
+
+    offering_raw, offering_meta = results["offering"]
+    fields_row, field_meta = results["fields"]
+    workflow_row, workflow_meta = results["workflow"]
+
 
     offering = minimal_normalize_offering(json_only(offering_raw))
 
@@ -567,15 +763,6 @@ def create_structure_json(kb_path="kb/chroma_ivanti", out_dir="structured", k=10
 
 
 
-    fields_row, field_meta = complete_extract_data(
-        retriever= retriever_data,
-        base_queries= base_fields,
-        llm= llm_brain,
-        bucket="fields",
-        system_prompt= FIELDS_SYS,
-        user_prompt= FIELDS_USER
-    )
-
     fields = json_only(fields_row)
 
 
@@ -600,15 +787,6 @@ def create_structure_json(kb_path="kb/chroma_ivanti", out_dir="structured", k=10
 
     
 
-    workflow_row , workflow_meta = complete_extract_data(
-        retriever= retriever_data,
-        base_queries= base_workflow,
-        llm= llm_brain,
-        bucket="workflow",
-        system_prompt= WORKFLOW_SYS,
-        user_prompt= WORKFLOW_USER    
-    )
-    
     workflow = json_only(workflow_row)
 
     # validation if the LLM fail to get notification
@@ -627,7 +805,7 @@ def create_structure_json(kb_path="kb/chroma_ivanti", out_dir="structured", k=10
     # those like end of the book information
     workflow["version"] = "1.0.0"
     workflow["generated_at"] = datetime.now(timezone.utc).isoformat()
-    workflow["source_docs"] = ["Request Offering BRD.docx"]
+    workflow["source_docs"] = list(source_docs)
 
 
     with open(os.path.join(out_dir, "workflow_logic.json"), "w", encoding="utf-8") as f:
@@ -641,7 +819,7 @@ def create_structure_json(kb_path="kb/chroma_ivanti", out_dir="structured", k=10
     "delivery_items": None,                    
     "version": "1.0.0",
     "generated_at": datetime.now(timezone.utc).isoformat(),
-    "source_docs": ["Request Offering BRD.docx"]
+    "source_docs": list(source_docs)
     }
 
     with open(os.path.join(out_dir, "form.json"), "w", encoding="utf-8") as f:
@@ -660,6 +838,8 @@ def create_structure_json(kb_path="kb/chroma_ivanti", out_dir="structured", k=10
     print("Wrote:", os.path.join(out_dir, "fields_table.json"))
     print("Wrote:", os.path.join(out_dir, "workflow_logic.json"))    
     print("Wrote:", os.path.join(out_dir, "form.json"))
+    if isinstance(llm_brain, CachedChat) and llm is None:
+        print(f"LLM cache: {llm_brain.hits} hits, {llm_brain.misses} calls")
 
 
 if __name__ == "__main__":
@@ -667,5 +847,6 @@ if __name__ == "__main__":
         kb_path="kb/chroma_ivanti",
         out_dir="structured",
         k=10,
-        model="gpt-4o-mini"
+        model="gpt-4o-mini",
+        max_workers=3
     )
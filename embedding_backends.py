@@ -0,0 +1,119 @@
+import os, re, zlib
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+
+# Which embedding model a KB is built with. Picked from EMBED_BACKEND / EMBED_MODEL (env or .env) unless
+# passed explicitly, and stamped into the Chroma collection metadata so a KB is never queried or extended
+# with vectors from a different model.
+#
+#   openai   text-embedding-3-small (default; cached in kb/embedding_cache.sqlite)
+#   hashing  hashing-<dim>, e.g. hashing-1024: local, CPU only, no network, no per-token cost
+
+DEFAULT_BACKEND = "openai"
+DEFAULT_MODELS = {"openai": "text-embedding-3-small", "hashing": "hashing-1024"}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+class KBMismatchError(RuntimeError):
+    pass
+
+
+def resolve(backend: str | None = None, model: str | None = None):
+    if backend is None:
+        if model and model.startswith("hashing-"):
+            backend = "hashing"   # an explicit hashing-<dim> model names its backend
+        else:
+            backend = os.getenv("EMBED_BACKEND") or DEFAULT_BACKEND
+            model = model or os.getenv("EMBED_MODEL")   # the env model only goes with the env backend
+            if model and model.startswith("hashing-") and not os.getenv("EMBED_BACKEND"):
+                backend = "hashing"
+    backend = backend.lower()
+    if backend not in DEFAULT_MODELS:
+        raise ValueError(f"Unknown embedding backend: {backend} (expected one of {', '.join(DEFAULT_MODELS)})")
+    model = model or DEFAULT_MODELS[backend]
+    if (backend == "hashing") != bool(re.fullmatch(r"hashing-\d+", model)):
+        raise ValueError(f"Embedding model {model} doesn't belong to the {backend} backend "
+                         f"(hashing models look like hashing-<dim>)")
+    return backend, model
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Signed feature hashing of words + word bigrams, log-scaled and L2-normalised (cosine-ready).
+    Stateless, so documents and queries embed independently and identically on any machine.
+    """
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def _vector(self, text: str) -> List[float]:
+        import numpy as np
+
+        words = _WORD_RE.findall(text.lower())
+        feats = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        if not feats:
+            return [0.0] * self.dim
+        h = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in feats), dtype=np.uint32, count=len(feats))
+        signs = np.where(h & 0x80000000, -1.0, 1.0)
+        vec = np.bincount(h % self.dim, weights=signs, minlength=self.dim)
+        vec = np.sign(vec) * np.log1p(np.abs(vec))      # damp repeated terms
+        norm = np.linalg.norm(vec)
+        return (vec / norm if norm else vec).astype(np.float32).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+
+def make_embeddings(backend: str | None = None, model: str | None = None):
+    backend, model = resolve(backend, model)
+    if backend == "hashing":
+        return HashingEmbeddings(int(model[len("hashing-"):]))   # resolve() checked the name
+
+    from embedding_cache import get_embeddings
+    return get_embeddings(model)
+
+
+def collection_stamp(backend: str | None = None, model: str | None = None) -> dict:
+    backend, model = resolve(backend, model)
+    return {"embedding_backend": backend, "embedding_model": model}
+
+
+def open_store(persist_dir: str, collection: str = "ivanti_kb", backend: str | None = None, model: str | None = None,
+               reset: bool = False):
+    """
+    Chroma store for the configured backend. An empty collection is stamped with the backend; a non-empty
+    one must carry the same stamp (KBs built before the stamp existed count as openai/text-embedding-3-small).
+    reset=True drops the collection first (a rebuild may switch backends).
+    """
+    from langchain_chroma import Chroma
+
+    stamp = collection_stamp(backend, model)
+    vs = Chroma(
+        collection_name=collection,
+        embedding_function=make_embeddings(stamp["embedding_backend"], stamp["embedding_model"]),
+        persist_directory=persist_dir,
+    )
+    if reset:
+        vs.reset_collection()
+
+    meta = dict(vs._collection.metadata or {})
+    if "embedding_backend" in meta or vs._collection.count():
+        have = {"embedding_backend": meta.get("embedding_backend", "openai"),
+                "embedding_model": meta.get("embedding_model", DEFAULT_MODELS["openai"])}
+        if have != stamp:
+            raise KBMismatchError(
+                f"KB {persist_dir}/{collection} was built with {have['embedding_backend']}/{have['embedding_model']}, "
+                f"configured {stamp['embedding_backend']}/{stamp['embedding_model']}; rebuild it into another persist dir "
+                f"or set EMBED_BACKEND / EMBED_MODEL to match."
+            )
+    if any(meta.get(k) != v for k, v in stamp.items()):
+        # modify() rejects hnsw:* keys (the KB uses Chroma's defaults, so normally there are none)
+        keep = {k: v for k, v in meta.items() if not k.startswith("hnsw:")}
+        vs._collection.modify(metadata={**keep, **stamp})
+    return vs
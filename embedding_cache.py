@@ -0,0 +1,140 @@
+import hashlib, sqlite3, threading, time
+from array import array
+from pathlib import Path
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+
+EMBED_MODEL = "text-embedding-3-small"
+CACHE_PATH = "kb/embedding_cache.sqlite"
+MAX_ENTRIES = 200_000   # ~1.2 GB worst case for 1536-dim float32 vectors, usually far less
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    SQLite table of float32 vectors keyed by (model, sha256(text)).
+    When it grows past max_entries the least recently used rows are dropped.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = MAX_ENTRIES):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                   model TEXT NOT NULL,
+                   text_hash TEXT NOT NULL,
+                   vector BLOB NOT NULL,
+                   last_used REAL NOT NULL,
+                   PRIMARY KEY (model, text_hash))"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._db.commit()
+
+    def get_many(self, model: str, hashes: List[str]) -> dict:
+        found = {}
+        uniq = list(dict.fromkeys(hashes))
+        with self._lock:
+            # sqlite caps bound parameters, so look up in slices
+            for i in range(0, len(uniq), 500):
+                part = uniq[i:i + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._db.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model=? AND text_hash IN ({marks})",
+                    [model, *part],
+                ).fetchall()
+                for h, blob in rows:
+                    vec = array("f")
+                    vec.frombytes(blob)
+                    found[h] = vec.tolist()
+            if found:
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE embeddings SET last_used=? WHERE model=? AND text_hash=?",
+                    [(now, model, h) for h in found],
+                )
+                self._db.commit()
+        return found
+
+    def put_many(self, model: str, items: dict) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings(model, text_hash, vector, last_used) VALUES (?,?,?,?)",
+                [(model, h, array("f", vec).tobytes(), now) for h, vec in items.items()],
+            )
+            self._evict()
+            self._db.commit()
+
+    def _evict(self) -> None:
+        (count,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        extra = count - self.max_entries
+        if extra > 0:
+            self._db.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (extra,),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps any LangChain embeddings object; only texts missing from the cache reach the provider."""
+
+    def __init__(self, inner: Embeddings, model: str, cache: EmbeddingCache):
+        self.inner = inner
+        self.model = model
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [text_hash(t) for t in texts]
+        found = self.cache.get_many(self.model, hashes)
+
+        missing = {}
+        for h, t in zip(hashes, texts):
+            if h not in found and h not in missing:
+                missing[h] = t
+
+        if missing:
+            vectors = self.inner.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(self.model, fresh)
+            found.update(fresh)
+
+        return [found[h] for h in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        h = text_hash(text)
+        hit = self.cache.get_many(self.model, [h])
+        if h in hit:
+            return hit[h]
+        vec = self.inner.embed_query(text)
+        self.cache.put_many(self.model, {h: vec})
+        return vec
+
+
+_shared_caches = {}
+_shared_lock = threading.Lock()
+
+
+def get_embeddings(model: str = EMBED_MODEL, cache_path: str = CACHE_PATH, max_entries: int = MAX_ENTRIES):
+    """The embedding function used by ingestion and retrieval; one cache file per path, shared in-process."""
+    from langchain_openai import OpenAIEmbeddings
+
+    with _shared_lock:
+        cache = _shared_caches.get(cache_path)
+        if cache is None:
+            cache = _shared_caches[cache_path] = EmbeddingCache(cache_path, max_entries)
+    return CachedEmbeddings(OpenAIEmbeddings(model=model), model, cache)
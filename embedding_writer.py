@@ -0,0 +1,199 @@
+import random, sqlite3, threading, time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+from context_packing import count_tokens
+
+
+BATCH_SIZE = 64           # texts per embedding request
+MAX_CONCURRENCY = 4       # embedding requests in flight
+MAX_RETRIES = 6
+
+
+def checkpoint_path(persist_dir: str, collection: str) -> str:
+    # next to the KB it belongs to (kb/chroma_ivanti -> kb/chroma_ivanti.ivanti_kb.checkpoint.sqlite)
+    return f"{Path(persist_dir)}.{collection}.checkpoint.sqlite"
+
+
+class IngestCheckpoint:
+    """
+    Chunk ids already written to one collection by an ingest that has not finished yet.
+    A rerun skips them; a finished ingest clears the table.
+    """
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS done (id TEXT PRIMARY KEY, written REAL NOT NULL)")
+        self._db.commit()
+
+    def done_ids(self, ids: List[str]) -> set:
+        found = set()
+        with self._lock:
+            for i in range(0, len(ids), 500):
+                part = ids[i:i + 500]
+                marks = ",".join("?" * len(part))
+                found.update(r[0] for r in self._db.execute(f"SELECT id FROM done WHERE id IN ({marks})", part))
+        return found
+
+    def mark(self, ids: List[str]) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO done(id, written) VALUES (?,?)", [(i, now) for i in ids])
+            self._db.commit()
+
+    def in_progress(self) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM done LIMIT 1").fetchone() is not None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM done")
+            self._db.commit()
+
+
+class TokenBucket:
+    """Refills `rate` units per second up to `capacity`; acquire(n) blocks until n units are available."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._level = capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n: float = 1.0) -> None:
+        n = min(n, self.capacity)   # a single oversized request still goes through, at full-bucket cost
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._level = min(self.capacity, self._level + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._level >= n:
+                    self._level -= n
+                    return
+                wait_s = (n - self._level) / self.rate
+            time.sleep(wait_s)
+
+
+def is_rate_limited(e: Exception) -> bool:
+    status = getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None)
+    return status == 429 or "RateLimit" in type(e).__name__
+
+
+def is_transient(e: Exception) -> bool:
+    status = getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None)
+    name = type(e).__name__
+    return is_rate_limited(e) or (isinstance(status, int) and status >= 500) or "Timeout" in name or "Connection" in name
+
+
+def retry_after(e: Exception):
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class EmbeddingWriter:
+    """
+    Embeds (id, Document) pairs in batches on a bounded thread pool and upserts them into a Chroma store.
+
+    - requests_per_minute / tokens_per_minute: token buckets in front of every embedding request
+    - 429 / 5xx / timeouts: exponential backoff with jitter (Retry-After wins when the provider sends it)
+    - checkpoint: ids written by an unfinished run are skipped, so an interrupted ingest resumes
+    - lexical: a BM25Index that gets the same batches (same ids) as the collection
+    """
+
+    def __init__(self, vectordb, embeddings, batch_size: int = BATCH_SIZE, max_concurrency: int = MAX_CONCURRENCY,
+                 requests_per_minute: float | None = None, tokens_per_minute: float | None = None,
+                 max_retries: int = MAX_RETRIES, checkpoint: IngestCheckpoint | None = None, lexical=None):
+        self.vectordb = vectordb
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.checkpoint = checkpoint
+        self.lexical = lexical   # lexical_index.BM25Index kept in step with the collection, optional
+        self.requests = TokenBucket(requests_per_minute / 60, max(1.0, requests_per_minute / 60)) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute / 6) if tokens_per_minute else None
+        self.stats = {"written": 0, "skipped": 0, "requests": 0, "retries": 0, "seconds": 0.0}
+        self._stats_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        n_tokens = sum(count_tokens(t) for t in texts) if self.tokens else 0
+        for attempt in range(self.max_retries + 1):
+            # every attempt, retries included, is a request the provider counts against the limits
+            if self.requests:
+                self.requests.acquire()
+            if self.tokens:
+                self.tokens.acquire(n_tokens)
+            try:
+                with self._stats_lock:
+                    self.stats["requests"] += 1
+                return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt == self.max_retries or not is_transient(e):
+                    raise
+                with self._stats_lock:
+                    self.stats["retries"] += 1
+                delay = retry_after(e) or min(60.0, 2 ** attempt) * (0.5 + random.random() / 2)
+                time.sleep(delay)
+
+    def _write_batch(self, batch: List[Tuple[str, object]]) -> int:
+        texts = [d.page_content for _, d in batch]
+        vectors = self._embed(texts)
+        ids = [i for i, _ in batch]
+        with self._write_lock:   # one writer into the collection at a time
+            metas = [d.metadata for _, d in batch]
+            self.vectordb._collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=metas)
+            if self.lexical is not None:
+                self.lexical.add(ids, texts, metas)
+            if self.checkpoint:
+                self.checkpoint.mark(ids)
+        return len(ids)
+
+    def _batches(self, items: Iterable[Tuple[str, object]]):
+        batch = []
+        for pair in items:
+            batch.append(pair)
+            if len(batch) >= self.batch_size:
+                yield self._skip_done(batch)
+                batch = []
+        if batch:
+            yield self._skip_done(batch)
+
+    def _skip_done(self, batch):
+        if not self.checkpoint:
+            return batch
+        done = self.checkpoint.done_ids([i for i, _ in batch])
+        if done:
+            with self._stats_lock:
+                self.stats["skipped"] += len(done)
+        return [p for p in batch if p[0] not in done]
+
+    def write(self, items: Iterable[Tuple[str, object]]) -> dict:
+        """Consume (id, Document) pairs; returns the stats dict (written, skipped, requests, retries, seconds, chunks_per_second)."""
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            pending = set()
+            for batch in self._batches(items):
+                if not batch:
+                    continue
+                pending.add(pool.submit(self._write_batch, batch))
+                # keep at most 2x concurrency batches in memory; a failed batch stops the run here
+                while len(pending) >= self.max_concurrency * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for f in done:
+                        self.stats["written"] += f.result()
+            for f in pending:
+                self.stats["written"] += f.result()
+
+        self.stats["seconds"] = round(time.perf_counter() - start, 2)
+        s = self.stats["seconds"]
+        self.stats["chunks_per_second"] = round(self.stats["written"] / s, 1) if s > 0 else None
+        return self.stats
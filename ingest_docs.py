@@ -1,11 +1,15 @@
-import os , hashlib
+import os , hashlib, multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import chain
 from pathlib import Path
 from dotenv import load_dotenv
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_chroma import Chroma
-from langchain_core.tools.retriever import create_retriever_tool
+from embedding_writer import EmbeddingWriter, IngestCheckpoint, MAX_CONCURRENCY, checkpoint_path
+from lexical_index import BM25Index, default_path as lexical_path
+
+# the loaders, splitter, Chroma and the embedding client are imported where they are used, so importing
+# this module (e.g. for PERSIST_DIR / pdf_path in batch_extract) doesn't load the whole LangChain stack
 
 load_dotenv()
 api_key = os.getenv("OPENAI_API_KEY")
@@ -21,27 +25,129 @@ brd_path = DATA["brd"]
 
 PERSIST_DIR= "kb/chroma_ivanti"
 
-def load_all_docs():
+EMBED_BATCH = 128          # chunks per embedding request / collection upsert while streaming
+PDF_PAGES_PER_TASK = 8     # pages one worker process extracts per task
+
+def load_file(path: Path):
+    from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader
+
+    loader = PyPDFLoader if path.suffix.lower() == ".pdf" else Docx2txtLoader
     docs = []
+    for source in loader(str(path)).load():
+        source.metadata["source"] = path.name
+        source.metadata["source_path"] = str(path)
+        docs.append(source)
+    return docs
 
-    if pdf_path.exists():
-        for source in PyPDFLoader(str(pdf_path)).load():
-            source.metadata["source"] = pdf_path.name      
-            source.metadata["source_path"] = str(pdf_path) 
-            docs.append(source)
 
-    
-    if brd_path.exists():
-        for source in Docx2txtLoader(str(brd_path)).load():
-            source.metadata["source"] = brd_path.name       
-            source.metadata["source_path"] = str(brd_path)   
-            docs.append(source)
+def load_all_docs(paths=None):
+    # default is the vendor PDF + the one BRD; batch_extract passes the PDF + every BRD in its manifest
+    docs = []
+
+    for path in (paths or [pdf_path, brd_path]):
+        path = Path(path)
+        if path.exists():
+            docs.extend(load_file(path))
 
     if not docs:
         raise FileNotFoundError("No source docs found.")
     return docs
 
 
+# ---- streaming ingest: pages are extracted in worker processes a few tasks ahead of the consumer,
+# split one page at a time and handed out in EMBED_BATCH-sized lists, so embedding starts after the
+# first pages and memory stays flat however long the PDF is.
+
+def existing_paths(paths=None):
+    return [Path(p) for p in (paths or [pdf_path, brd_path]) if Path(p).exists()]
+
+
+def _pdf_page_count(path: str) -> int:
+    from pypdf import PdfReader   # what PyPDFLoader uses underneath
+    return len(PdfReader(path).pages)
+
+
+def _extract_pages(path: str, start: int, stop: int):
+    # runs in a worker process. The reader is opened per task and dropped with it: pypdf keeps every object
+    # it resolves on the reader, so a reader kept for the worker's lifetime grows with each page extracted.
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    return [(i, reader.pages[i].extract_text()) for i in range(start, stop)]
+
+
+def _take(it, n):
+    for _ in range(n):
+        item = next(it, None)
+        if item is None:
+            return
+        yield item
+
+
+def iter_pages(path: Path, pool=None, window: int = 8):
+    """Pages of one source as Documents, in order. PDFs are extracted on `pool` with at most `window` tasks in flight."""
+    from langchain_core.documents import Document
+
+    path = Path(path)
+    if path.suffix.lower() != ".pdf":
+        yield from load_file(path)
+        return
+
+    n_pages = _pdf_page_count(str(path))
+    ranges = iter([(s, min(s + PDF_PAGES_PER_TASK, n_pages)) for s in range(0, n_pages, PDF_PAGES_PER_TASK)])
+    if pool is None:
+        results = (_extract_pages(str(path), s, e) for s, e in ranges)
+    else:
+        def ordered():
+            pending = deque(pool.submit(_extract_pages, str(path), s, e) for s, e in _take(ranges, window))
+            while pending:
+                done = pending.popleft().result()
+                for s, e in _take(ranges, 1):
+                    pending.append(pool.submit(_extract_pages, str(path), s, e))
+                yield done
+        results = ordered()
+
+    for page_texts in results:
+        for i, text in page_texts:
+            yield Document(page_content=text, metadata={"source": path.name, "source_path": str(path), "page": i})
+
+
+def make_splitter():
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size= 1200,
+        chunk_overlap= 200,
+        separators=["\n\n", "\n", " ", ""],
+    )
+
+
+def iter_chunk_batches(paths=None, batch_size=EMBED_BATCH, workers=None):
+    """
+    Chunks of every source in fixed-size lists. Splitting page by page gives the same chunks as
+    split_documents(all pages), since the splitter never joins text across documents.
+    """
+    paths = existing_paths(paths)
+    if not paths:
+        raise FileNotFoundError("No source docs found.")
+
+    splitter = make_splitter()
+    workers = workers or min(4, os.cpu_count() or 1)
+    use_pool = workers > 1 and any(p.suffix.lower() == ".pdf" for p in paths)
+    # spawn, not fork: the generator is consumed after open_store has started Chroma's threads, and forking a
+    # multithreaded process can leave a worker holding a lock no thread will ever release
+    spawn = multiprocessing.get_context("spawn")
+    with (ProcessPoolExecutor(max_workers=workers, mp_context=spawn) if use_pool else nullcontext()) as pool:
+        batch = []
+        for path in paths:
+            for page in iter_pages(path, pool, window=workers * 2):
+                batch.extend(splitter.split_documents([page]))
+                while len(batch) >= batch_size:
+                    yield batch[:batch_size]
+                    batch = batch[batch_size:]
+        if batch:
+            yield batch
+
+
 def make_id(doc, idx):
     src = doc.metadata.get("source", "unknown")
     page = str(doc.metadata.get("page", ""))  
@@ -49,30 +155,105 @@ def make_id(doc, idx):
     return f"{Path(src).stem}-{page}-{idx}-{h}"
 
 
+# id from the chunk text itself, so the same paragraph keeps the same id between runs
+# even when chunks before it are added or removed (make_id shifts with idx)
+def make_content_id(doc):
+    src = doc.metadata.get("source", "unknown")
+    h = hashlib.sha1(f"{src}\n{doc.page_content}".encode("utf-8")).hexdigest()
+    return f"{Path(src).stem}-{h[:20]}"
 
-def main_grounding_data(rebuild = False):
 
-    all_docs = load_all_docs()
+def sync_chunks(vectordb, chunks, sources=None, batch_size=EMBED_BATCH, writer=None):
+    """
+    Diff chunks against what is stored for the same sources and only embed the new ones.
+    chunks may be a stream when `sources` (file names) is given; new chunks go through `writer`
+    (an EmbeddingWriter, one is made when omitted). Returns (added, deleted, kept) counts.
+    """
+    if sources is None:
+        chunks = list(chunks)
+        sources = {c.metadata.get("source", "unknown") for c in chunks}
+    stored = vectordb.get(where={"source": {"$in": sorted(sources)}}, include=[])
+    existing = set(stored.get("ids", []))
 
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size= 1200,
-        chunk_overlap= 200,
-        separators=["\n\n", "\n", " ", ""],
-    )
-    chunks = splitter.split_documents(all_docs)
+    seen = set()
+
+    def new_chunks():
+        for c in chunks:
+            cid = make_content_id(c)
+            if cid in seen:
+                continue  # same text twice in one source -> embed once
+            seen.add(cid)
+            if cid not in existing:
+                c.metadata["content_hash"] = cid
+                yield cid, c
 
-    if (not rebuild) and Path(PERSIST_DIR).exists():
-        print(f"KB already exists at {PERSIST_DIR}; skip embedding.")
+    writer = writer or EmbeddingWriter(vectordb, vectordb.embeddings, batch_size=batch_size)
+    added = writer.write(new_chunks())["written"]
+
+    # stale ids are only deleted once the whole stream went through
+    stale_ids = [cid for cid in existing if cid not in seen]
+    if stale_ids:
+        vectordb.delete(ids=stale_ids)
+        if writer.lexical is not None:
+            writer.lexical.delete(stale_ids)
+
+    return added, len(stale_ids), len(seen) - added
+
+
+
+def main_grounding_data(rebuild = False, incremental = False, paths = None, workers = None, batch_size = EMBED_BATCH,
+                        max_concurrency = MAX_CONCURRENCY, requests_per_minute = None, tokens_per_minute = None,
+                        embed_backend = None, embed_model = None, persist_dir = PERSIST_DIR, collection = "ivanti_kb"):
+    """
+    requests_per_minute / tokens_per_minute: the embedding provider's limits (e.g. 3000 / 1_000_000).
+    An interrupted run leaves a checkpoint next to the KB (embedding_writer.checkpoint_path); the next run skips
+    the chunks it already wrote. rebuild=True discards it, drops the collection and the BM25 index and re-embeds everything.
+    embed_backend / embed_model: see embedding_backends (default: EMBED_BACKEND / EMBED_MODEL, else openai).
+    """
+    from embedding_backends import open_store
+
+    checkpoint = IngestCheckpoint(checkpoint_path(persist_dir, collection))
+    lexical = BM25Index(lexical_path(persist_dir))
+    if rebuild:
+        # start from empty: make_id is positional (ids from before a document edit may now hold other text),
+        # and chunks an incremental run stored under make_content_id would otherwise stay next to the new ones
+        checkpoint.clear()
+        lexical.clear()
+
+    # checked before anything is parsed; an unfinished previous run is resumed instead of skipped
+    if (not rebuild) and (not incremental) and Path(persist_dir).exists() and not checkpoint.in_progress():
+        print(f"KB already exists at {persist_dir}; skip embedding.")
+        if not len(lexical):
+            n = lexical.backfill(open_store(persist_dir, collection, embed_backend, embed_model)._collection)
+            print(f"Built the BM25 index for exact: queries from {n} stored chunks.")
         return
 
-    vectordb = Chroma(
-        collection_name="ivanti_kb",
-        embedding_function=OpenAIEmbeddings(model="text-embedding-3-small"),
-        persist_directory=PERSIST_DIR
-    )
+    batches = iter_chunk_batches(paths, batch_size=batch_size, workers=workers)
+
+    vectordb = open_store(persist_dir, collection, embed_backend, embed_model, reset=rebuild)
+    embeddings = vectordb.embeddings
+    if not len(lexical) and vectordb._collection.count():
+        lexical.backfill(vectordb._collection)   # KB from before the BM25 index existed
+    full = not incremental or rebuild
+    writer = EmbeddingWriter(vectordb, embeddings, batch_size=batch_size, max_concurrency=max_concurrency,
+                             requests_per_minute=requests_per_minute, tokens_per_minute=tokens_per_minute,
+                             # incremental runs resume on their own (they diff against the collection)
+                             checkpoint=checkpoint if full else None, lexical=lexical)
 
-    ids = [make_id(c, i) for i, c in enumerate(chunks)]
-    vectordb.add_documents(chunks, ids= ids)
+    if not full:
+        # only changed chunks cost embedding calls; chunks that disappeared from the docs get removed,
+        # including every chunk of a source file that no longer exists
+        sources = [Path(p).name for p in (paths or [pdf_path, brd_path])]
+        added, deleted, kept = sync_chunks(vectordb, chain.from_iterable(batches), sources, batch_size, writer)
+        print(f"Incremental ingest: {added} added, {deleted} deleted, {kept} unchanged.")
+    else:
+        # make_id numbers chunks across all sources, as before
+        writer.write((make_id(c, i), c) for i, c in enumerate(chain.from_iterable(batches)))
+
+    st = writer.stats
+    print(f"Embedded {st['written']} chunks ({st['skipped']} already written by an earlier run) "
+          f"in {st['seconds']}s, {st['requests']} requests, {st['retries']} retries.")
+    checkpoint.clear()
 
     try:
         vectordb.persist()
@@ -80,13 +261,11 @@ def main_grounding_data(rebuild = False):
         pass
 
 
-def build_retriever_tool():
-        
-    vectordb = Chroma(
-        collection_name="ivanti_kb",
-        embedding_function=OpenAIEmbeddings(model="text-embedding-3-small"),
-        persist_directory=PERSIST_DIR
-    )
+def build_retriever_tool(embed_backend=None, embed_model=None):
+    from langchain_core.tools.retriever import create_retriever_tool
+    from embedding_backends import open_store
+
+    vectordb = open_store(PERSIST_DIR, "ivanti_kb", embed_backend, embed_model)
 
     retriever_data = vectordb.as_retriever(search_kwargs={"k": 5})
 
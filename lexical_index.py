@@ -0,0 +1,238 @@
+import json, math, re, sqlite3, threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from context_packing import EXACT_RE, RRF_K
+
+
+# Persistent BM25 index over the same chunks (and ids) as the Chroma collection, kept next to it
+# (kb/chroma_ivanti -> kb/chroma_ivanti.bm25.sqlite) and written by the same EmbeddingWriter batches.
+#
+# exact:"Label" queries are answered here: chunks containing every label word, kept only if the words
+# appear as a phrase, ranked by BM25. No embedding call. Free-text queries fuse BM25 with the vector
+# ranking (reciprocal rank fusion).
+#
+# SQLite is the store; queries run on an in-memory copy of the postings that is loaded on first use and
+# reloaded after writes.
+
+K1 = 1.5
+B = 0.75
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD_RE.findall((text or "").lower())
+
+
+def default_path(persist_dir: str) -> str:
+    return str(Path(persist_dir)) + ".bm25.sqlite"
+
+
+def _matches(meta: dict, where) -> bool:
+    """The subset of Chroma's where syntax this repo uses: equality, $eq, $in, $and."""
+    if not where:
+        return True
+    for key, cond in where.items():
+        if key == "$and":
+            if not all(_matches(meta, w) for w in cond):
+                return False
+        elif isinstance(cond, dict):
+            for op, val in cond.items():
+                if op == "$in":
+                    if meta.get(key) not in val:
+                        return False
+                elif op == "$eq":
+                    if meta.get(key) != val:
+                        return False
+                else:
+                    raise NotImplementedError(f"where operator {op} is not supported by the lexical index")
+        elif meta.get(key) != cond:
+            return False
+    return True
+
+
+class BM25Index:
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS chunks (
+                   id TEXT PRIMARY KEY,
+                   text TEXT NOT NULL,
+                   meta TEXT NOT NULL,
+                   length INTEGER NOT NULL)"""
+        )
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS postings (
+                   term TEXT NOT NULL,
+                   id TEXT NOT NULL,
+                   tf INTEGER NOT NULL,
+                   PRIMARY KEY (term, id)) WITHOUT ROWID"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_postings_id ON postings(id)")
+        self._db.commit()
+        self._mem = None   # (ids, texts, metas, norm_texts, lengths, postings, avgdl, row_of), see _load
+        self._results = {}  # query -> (the _mem it was computed on, results)
+
+    # ---- writes
+
+    def add(self, ids: List[str], texts: List[str], metadatas: List[dict]) -> None:
+        """Insert or replace chunks (same ids as the vector store)."""
+        rows, posts = [], []
+        for cid, text, meta in zip(ids, texts, metadatas):
+            toks = tokenize(text)
+            rows.append((cid, text, json.dumps(meta or {}, ensure_ascii=False), len(toks)))
+            posts.extend((term, cid, tf) for term, tf in Counter(toks).items())
+        with self._lock:
+            self._delete(ids)
+            self._db.executemany("INSERT INTO chunks(id, text, meta, length) VALUES (?,?,?,?)", rows)
+            self._db.executemany("INSERT INTO postings(term, id, tf) VALUES (?,?,?)", posts)
+            self._db.commit()
+            self._mem = None
+
+    def delete(self, ids: List[str]) -> None:
+        with self._lock:
+            self._delete(ids)
+            self._db.commit()
+            self._mem = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM postings")
+            self._db.execute("DELETE FROM chunks")
+            self._db.commit()
+            self._mem = None
+
+    def _delete(self, ids: List[str]) -> None:
+        for i in range(0, len(ids), 500):
+            part = ids[i:i + 500]
+            marks = ",".join("?" * len(part))
+            self._db.execute(f"DELETE FROM postings WHERE id IN ({marks})", part)
+            self._db.execute(f"DELETE FROM chunks WHERE id IN ({marks})", part)
+
+    def backfill(self, collection, page: int = 1000) -> int:
+        """Index every chunk already in a Chroma collection (KBs built before this index existed)."""
+        n, offset = 0, 0
+        while True:
+            got = collection.get(include=["documents", "metadatas"], limit=page, offset=offset)
+            if not got["ids"]:
+                return n
+            self.add(got["ids"], got["documents"], got["metadatas"])
+            n += len(got["ids"])
+            offset += page
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    # ---- reads
+
+    def _load(self):
+        with self._lock:
+            if self._mem is not None:
+                return self._mem
+            ids, texts, metas, norm, lengths, row_of = [], [], [], [], [], {}
+            for cid, text, meta, length in self._db.execute("SELECT id, text, meta, length FROM chunks"):
+                row_of[cid] = len(ids)
+                ids.append(cid)
+                texts.append(text)
+                metas.append(json.loads(meta))
+                norm.append(" " + " ".join(tokenize(text)) + " ")   # padded so phrase checks match whole words
+                lengths.append(length)
+            postings: Dict[str, Dict[int, int]] = {}   # term -> {row: tf}
+            for term, cid, tf in self._db.execute("SELECT term, id, tf FROM postings"):
+                postings.setdefault(term, {})[row_of[cid]] = tf
+            avgdl = (sum(lengths) / len(lengths)) if lengths else 0.0
+            self._mem = (ids, texts, metas, norm, lengths, postings, avgdl, row_of)
+            return self._mem
+
+    def _score(self, terms: List[str], only=None, where=None) -> Dict[int, float]:
+        ids, _, metas, _, lengths, postings, avgdl, _ = self._load()
+        n = len(ids)
+        scores: Dict[int, float] = {}
+        for term in set(terms):
+            plist = postings.get(term)
+            if not plist:
+                continue
+            idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            rows = plist.items() if only is None else ((r, plist[r]) for r in only if r in plist)
+            for row, tf in rows:
+                norm = tf + K1 * (1 - B + B * lengths[row] / avgdl)
+                scores[row] = scores.get(row, 0.0) + idf * tf * (K1 + 1) / norm
+        if where:
+            scores = {row: s for row, s in scores.items() if _matches(metas[row], where)}
+        return scores
+
+    def search(self, query: str, k: int = 10, where=None) -> List[Tuple[str, float]]:
+        """BM25 over the query words; [(chunk id, score)] best first."""
+        ids = self._load()[0]
+        scores = self._score(tokenize(query), where=where)
+        best = sorted(scores, key=scores.get, reverse=True)[:k]
+        return [(ids[r], scores[r]) for r in best]
+
+    def exact(self, label: str, k: int = 10, where=None) -> List[Tuple[str, float]]:
+        """Chunks containing `label` as a phrase (case/punctuation-insensitive), BM25-ranked."""
+        ids, _, _, norm, _, postings, _, _ = self._load()
+        terms = tokenize(label)
+        if not terms:
+            return []
+        plists = [postings.get(t) for t in terms]
+        if not all(plists):
+            return []
+        plists.sort(key=len)
+        rows = set(plists[0])
+        for pl in plists[1:]:
+            rows.intersection_update(pl.keys())
+        phrase = " " + " ".join(terms) + " "
+        rows = {r for r in rows if phrase in norm[r]}
+        scores = self._score(terms, only=rows, where=where)
+        best = sorted(scores, key=scores.get, reverse=True)[:k]
+        return [(ids[r], scores[r]) for r in best]
+
+    def query(self, q: str, k: int = 10, where=None) -> List[Tuple[str, float]]:
+        """exact:"..." or free text. Results are memoized until the next write (the query lists are fixed)."""
+        mem = self._load()
+        key = (q, k, json.dumps(where, sort_keys=True) if where else None)
+        hit = self._results.get(key)
+        if hit is not None and hit[0] is mem:
+            return hit[1]
+        m = EXACT_RE.match(q)
+        res = self.exact(m.group(1), k, where) if m else self.search(q, k, where)
+        if len(self._results) > 4096:
+            self._results.clear()
+        self._results[key] = (mem, res)
+        return res
+
+    def get(self, cid: str) -> Tuple[str, dict]:
+        """(text, metadata) of one chunk."""
+        _, texts, metas, *_, row_of = self._load()
+        row = row_of[cid]
+        return texts[row], metas[row]
+
+
+_open: Dict[str, BM25Index] = {}
+_open_lock = threading.Lock()
+
+
+def open_index(persist_dir: str):
+    """The BM25 index next to a Chroma persist dir, shared in-process; None when it was never built."""
+    path = default_path(persist_dir)
+    with _open_lock:
+        if path not in _open:
+            if not Path(path).exists():
+                return None
+            _open[path] = BM25Index(path)
+        return _open[path]
+
+
+def fuse(rankings: List[List[str]], k: int) -> List[str]:
+    """Reciprocal rank fusion of several id rankings; top k ids."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, cid in enumerate(ranking):
+            scores[cid] = scores.get(cid, 0.0) + 1.0 / (RRF_K + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)[:k]
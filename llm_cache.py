@@ -0,0 +1,97 @@
+import hashlib, json, sqlite3, threading, time
+from pathlib import Path
+from types import SimpleNamespace
+
+
+CACHE_PATH = "kb/llm_cache.sqlite"
+MAX_ENTRIES = 5_000
+TTL_SECONDS = 7 * 24 * 3600
+
+
+def prompt_key(model: str, messages) -> str:
+    # messages are [{"role":..., "content":...}], so system prompt + user prompt (with its context) are both in here
+    raw = json.dumps([model, messages], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    SQLite store of chat completions keyed by (model, messages).
+    Rows older than ttl are ignored and purged; past max_entries the least recently used rows are dropped.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = MAX_ENTRIES, ttl: float = TTL_SECONDS):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                   key TEXT PRIMARY KEY,
+                   model TEXT NOT NULL,
+                   content TEXT NOT NULL,
+                   created REAL NOT NULL,
+                   last_used REAL NOT NULL)"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_resp_last_used ON responses(last_used)")
+        self._db.commit()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT content, created FROM responses WHERE key=?", (key,)).fetchone()
+            if row is None:
+                return None
+            content, created = row
+            if now - created > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key=?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE responses SET last_used=? WHERE key=?", (now, key))
+            self._db.commit()
+            return content
+
+    def put(self, key: str, model: str, content: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses(key, model, content, created, last_used) VALUES (?,?,?,?,?)",
+                (key, model, content, now, now),
+            )
+            self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            (count,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+            if count > self.max_entries:
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._db.commit()
+
+
+class CachedChat:
+    """
+    Drop-in for the llm.invoke(messages).content calls in data_structure_agent.
+    Only meaningful at temperature=0, where the same prompt is expected to give the same answer.
+    """
+
+    def __init__(self, llm, model: str, cache: LLMCache):
+        self.llm = llm
+        self.model = model
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    def invoke(self, messages):
+        key = prompt_key(self.model, messages)
+        content = self.cache.get(key)
+        if content is not None:
+            self.hits += 1
+            return SimpleNamespace(content=content)
+
+        self.misses += 1
+        content = self.llm.invoke(messages).content
+        self.cache.put(key, self.model, content)
+        return SimpleNamespace(content=content)
@@ -0,0 +1,74 @@
+from typing import Dict, List, Sequence
+
+
+# Maximal marginal relevance for a whole bucket of queries at once.
+#
+# The queries of one bucket share most of their fetch_k candidates, so every candidate vector is stored
+# once in one matrix, normalised once, and candidate x candidate similarity is computed once. The greedy
+# selection then runs in lockstep for all queries on (queries x candidates) arrays. Each query still only
+# picks from its own candidates, and the picks are the same as
+# langchain_core.vectorstores.utils.maximal_marginal_relevance run per query.
+
+
+def _unit_rows(m):
+    import numpy as np
+
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0   # zero vectors get similarity 0, as in langchain's cosine_similarity
+    return m / norms
+
+
+def candidate_matrix(candidates: Sequence[Sequence[str]], vectors: Dict[str, Sequence[float]]):
+    """Union of the per-query candidate ids -> (ids, unit-row float32 matrix, per-query row indexes)."""
+    import numpy as np
+
+    row_of: Dict[str, int] = {}
+    for cands in candidates:
+        for cid in cands:
+            row_of.setdefault(cid, len(row_of))
+    ids = list(row_of)
+    if not ids:
+        return ids, np.zeros((0, 0), dtype=np.float32), [[] for _ in candidates]
+    mat = _unit_rows(np.asarray([vectors[cid] for cid in ids], dtype=np.float32))
+    return ids, mat, [[row_of[cid] for cid in cands] for cands in candidates]
+
+
+def mmr_batch(query_vectors, candidates: Sequence[Sequence[str]], vectors: Dict[str, Sequence[float]],
+              k: int = 4, lambda_mult: float = 0.5) -> List[List[str]]:
+    """
+    MMR for every query over its own candidate ids; vectors maps candidate id -> embedding.
+    Returns the picked ids per query, in pick order (at most k, fewer when a query has fewer candidates).
+    """
+    import numpy as np
+
+    ids, cand, rows = candidate_matrix(candidates, vectors)
+    nq = len(rows)
+    if not ids or k <= 0:
+        return [[] for _ in range(nq)]
+
+    q = _unit_rows(np.asarray(query_vectors, dtype=np.float32).reshape(nq, -1))
+    rel = q @ cand.T                      # query x candidate
+    sim = cand @ cand.T                   # candidate x candidate, shared by all queries
+
+    open_ = np.zeros(rel.shape, dtype=bool)   # candidate still pickable for that query
+    for qi, r in enumerate(rows):
+        open_[qi, r] = True
+    redundancy = np.zeros(rel.shape, dtype=np.float32)   # max similarity to the query's picks so far
+    picked = np.full((nq, k), -1, dtype=np.int64)
+    every = np.arange(nq)
+
+    for step in range(k):
+        if step == 0:
+            score = rel   # first pick is the most similar candidate
+        else:
+            score = lambda_mult * rel - (1 - lambda_mult) * redundancy
+        best = np.where(open_, score, -np.inf).argmax(axis=1)   # argmax keeps the first of equal scores
+        live = open_[every, best]
+        if not live.any():
+            break
+        qs, bs = every[live], best[live]
+        picked[qs, step] = bs
+        open_[qs, bs] = False
+        redundancy[qs] = sim[bs] if step == 0 else np.maximum(redundancy[qs], sim[bs])
+
+    return [[ids[j] for j in row if j >= 0] for row in picked]
@@ -0,0 +1,8 @@
+import pytest
+
+import check_startup
+
+
+def test_entry_points_within_startup_budget():
+    pytest.importorskip("dotenv")   # data_structure_agent / ingest_docs load .env at import
+    assert check_startup.run(runs=3) == 0
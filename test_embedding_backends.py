@@ -0,0 +1,19 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from embedding_backends import resolve
+
+
+def test_hashing_model_selects_hashing_backend(monkeypatch):
+    monkeypatch.delenv("EMBED_BACKEND", raising=False)
+    monkeypatch.delenv("EMBED_MODEL", raising=False)
+    assert resolve(None, "hashing-64") == ("hashing", "hashing-64")
+    assert resolve(None, None) == ("openai", "text-embedding-3-small")
+
+
+def test_model_of_another_backend_is_rejected():
+    with pytest.raises(ValueError):
+        resolve("openai", "hashing-64")
+    with pytest.raises(ValueError):
+        resolve("hashing", "text-embedding-3-small")
@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+from embedding_writer import EmbeddingWriter, IngestCheckpoint
+
+
+class RateLimited(Exception):
+    status_code = 429
+    response = SimpleNamespace(headers={"retry-after": "0.01"})
+
+
+class FlakyEmbeddings:
+    """Answers 429 to the first `fail` requests, then one vector per text."""
+
+    def __init__(self, fail=0):
+        self.fail = fail
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.calls <= self.fail:
+            raise RateLimited("rate limited")
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+class FakeCollection:
+    def __init__(self):
+        self.rows = {}
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.rows.update(zip(ids, documents))
+
+
+def docs(n):
+    return [(f"c{i}", SimpleNamespace(page_content=f"chunk {i}", metadata={"source": "brd.docx"})) for i in range(n)]
+
+
+def test_retries_rate_limited_requests():
+    store = SimpleNamespace(_collection=FakeCollection())
+    emb = FlakyEmbeddings(fail=2)
+    stats = EmbeddingWriter(store, emb, batch_size=10, max_concurrency=1).write(docs(5))
+    assert stats["written"] == 5 and stats["retries"] == 2 and stats["requests"] == 3
+    assert sorted(store._collection.rows) == [f"c{i}" for i in range(5)]
+
+
+def test_checkpoint_skips_ids_already_written(tmp_path):
+    checkpoint = IngestCheckpoint(str(tmp_path / "kb.checkpoint.sqlite"))
+    checkpoint.mark(["c0", "c1", "c2"])   # an earlier run got this far
+    store = SimpleNamespace(_collection=FakeCollection())
+    emb = FlakyEmbeddings()
+    stats = EmbeddingWriter(store, emb, batch_size=2, checkpoint=checkpoint).write(docs(5))
+    assert stats["written"] == 2 and stats["skipped"] == 3
+    assert sorted(store._collection.rows) == ["c3", "c4"]
+    assert checkpoint.done_ids([f"c{i}" for i in range(5)]) == {f"c{i}" for i in range(5)}
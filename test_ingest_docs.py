@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("dotenv")   # ingest_docs loads .env at import
+
+from embedding_writer import EmbeddingWriter
+from ingest_docs import make_content_id, sync_chunks
+
+
+class FakeStore:
+    """The parts of a Chroma store sync_chunks and EmbeddingWriter use."""
+
+    def __init__(self):
+        self.rows = {}   # id -> (text, metadata)
+        self.embeddings = SimpleNamespace(embed_documents=lambda texts: [[1.0, 0.0] for _ in texts])
+        self._collection = SimpleNamespace(upsert=self._upsert)
+
+    def _upsert(self, ids, embeddings, documents, metadatas):
+        self.rows.update((i, (d, m)) for i, d, m in zip(ids, documents, metadatas))
+
+    def get(self, where, include):
+        wanted = set(where["source"]["$in"])
+        return {"ids": [i for i, (_, m) in self.rows.items() if m["source"] in wanted]}
+
+    def delete(self, ids):
+        for i in ids:
+            self.rows.pop(i, None)
+
+
+def chunk(source, text):
+    return SimpleNamespace(page_content=text, metadata={"source": source})
+
+
+def test_sync_chunks_adds_new_and_deletes_stale():
+    store = FakeStore()
+    assert sync_chunks(store, [chunk("brd.docx", "a"), chunk("brd.docx", "b")]) == (2, 0, 0)
+
+    # "b" edited to "c"; the same text twice is embedded once
+    edited = [chunk("brd.docx", "a"), chunk("brd.docx", "c"), chunk("brd.docx", "c")]
+    assert sync_chunks(store, edited) == (1, 1, 1)
+    assert set(store.rows) == {make_content_id(chunk("brd.docx", t)) for t in "ac"}
+
+
+def test_sync_chunks_drops_a_removed_source():
+    store = FakeStore()
+    sync_chunks(store, [chunk("old.docx", "x"), chunk("brd.docx", "a")])
+    writer = EmbeddingWriter(store, store.embeddings)
+    # old.docx no longer on disk: it is still one of the sources, but yields no chunks
+    assert sync_chunks(store, iter([chunk("brd.docx", "a")]), ["brd.docx", "old.docx"], writer=writer) == (0, 1, 1)
+    assert set(store.rows) == {make_content_id(chunk("brd.docx", "a"))}
@@ -0,0 +1,143 @@
+import argparse, json, os, sys, time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from xml.sax.saxutils import escape, quoteattr
+
+from loaders import LoadError, load_input_json, load_tenant_config
+from rules import default_rules, load_rules
+from validators import issue, validate_all
+
+
+# Validate every generated offering under a folder (CI / pre-deploy), one bundle per worker process.
+#
+# A bundle is any folder holding offering_info.json + form.json + workflow_logic.json
+# (the layout create_structure_json and batch_extract.py write). Its tenant_config.json is used when
+# present, otherwise the shared --tenant-config. Exit code is 1 when any bundle has an error.
+
+BUNDLE_FILES = ("offering_info.json", "form.json", "workflow_logic.json")
+
+_rules = None   # per worker process, set by _init_worker
+
+
+def find_bundles(root):
+    root = Path(root)
+    return sorted(p.parent for p in root.rglob("form.json")
+                  if all((p.parent / name).is_file() for name in BUNDLE_FILES))
+
+
+def _init_worker(rules_path):
+    global _rules
+    _rules = load_rules(rules_path) if rules_path else default_rules()
+
+
+def validate_dir(bundle_dir, tenant_config=None):
+    """Load + validate one bundle folder. Never raises: load failures become error issues."""
+    bundle_dir = Path(bundle_dir)
+    start = time.perf_counter()
+    try:
+        offering, form, workflow = load_input_json(*(bundle_dir / name for name in BUNDLE_FILES))
+        own = bundle_dir / "tenant_config.json"
+        if own.is_file():
+            tenant_cfg = load_tenant_config(own)
+        elif tenant_config:
+            tenant_cfg = load_tenant_config(tenant_config)
+        else:
+            tenant_cfg = {}
+        issues = validate_all(offering, form, workflow, tenant_cfg, _rules)   # one pass per bundle: no typed model
+    except (LoadError, ValueError) as e:
+        issues = [issue("error", "load", str(e))]
+    except Exception as e:   # one malformed bundle must not abort the run before the reports are written
+        issues = [issue("error", "validate", f"{type(e).__name__}: {e}")]
+
+    counts = Counter(i["severity"] for i in issues)
+    return {
+        "bundle": str(bundle_dir),
+        "status": "error" if counts["error"] else "ok",
+        "errors": counts["error"],
+        "warnings": counts["warn"],
+        "seconds": round(time.perf_counter() - start, 4),
+        "issues": issues,
+    }
+
+
+def summarize(results, elapsed):
+    by_msg = Counter((i["severity"], i["message"]) for r in results for i in r["issues"])
+    failed = sum(1 for r in results if r["status"] == "error")
+    return {
+        "bundles": len(results),
+        "ok": len(results) - failed,
+        "with_errors": failed,
+        "errors": sum(r["errors"] for r in results),
+        "warnings": sum(r["warnings"] for r in results),
+        "seconds": round(elapsed, 3),
+        "bundles_per_second": round(len(results) / elapsed, 1) if elapsed > 0 else None,
+        "top_issues": [{"severity": sev, "message": msg, "count": n} for (sev, msg), n in by_msg.most_common(20)],
+        "results": results,
+    }
+
+
+def write_junit(report, path):
+    # one <testcase> per bundle; errors fail it, warnings go to system-out
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             f'<testsuite name="ivanti-bundles" tests="{report["bundles"]}" failures="{report["with_errors"]}" '
+             f'errors="0" time="{report["seconds"]}">']
+    for r in report["results"]:
+        lines.append(f'  <testcase classname="bundles" name={quoteattr(r["bundle"])} time="{r["seconds"]}">')
+        errors = [i for i in r["issues"] if i["severity"] == "error"]
+        others = [i for i in r["issues"] if i["severity"] != "error"]
+        if errors:
+            body = "\n".join(f"{i['where']}: {i['message']}" for i in errors)
+            lines.append(f'    <failure message="{len(errors)} error(s)">{escape(body)}</failure>')
+        if others:
+            body = "\n".join(f"[{i['severity']}] {i['where']}: {i['message']}" for i in others)
+            lines.append(f"    <system-out>{escape(body)}</system-out>")
+        lines.append("  </testcase>")
+    lines.append("</testsuite>")
+    Path(path).write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def run(root, tenant_config=None, rules_path=None, workers=None, json_out=None, junit_out=None, quiet=False):
+    bundles = find_bundles(root)
+    if not bundles:
+        raise FileNotFoundError(f"No bundles ({', '.join(BUNDLE_FILES)}) under {root}")
+
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _init_worker(rules_path)
+        results = [validate_dir(b, tenant_config) for b in bundles]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(rules_path,)) as pool:
+            chunk = max(1, len(bundles) // (workers * 4))
+            results = list(pool.map(validate_dir, bundles, [tenant_config] * len(bundles), chunksize=chunk))
+    report = summarize(results, time.perf_counter() - start)
+
+    if json_out:
+        with open(json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if junit_out:
+        write_junit(report, junit_out)
+
+    if not quiet:
+        for r in results:
+            if r["issues"]:
+                print(f"[{r['status']}] {r['bundle']}: {r['errors']} error(s), {r['warnings']} warning(s)")
+    print(f"{report['ok']}/{report['bundles']} bundles without errors "
+          f"({report['errors']} errors, {report['warnings']} warnings) in {report['seconds']}s")
+    return report
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Validate every Ivanti bundle under a folder.")
+    ap.add_argument("root", help="folder searched recursively for bundles")
+    ap.add_argument("--tenant-config", default=None, help="shared tenant_config.json for bundles without their own")
+    ap.add_argument("--rules", default=None, help="rule file (default: validation_rules.json)")
+    ap.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    ap.add_argument("--json", dest="json_out", default=None, help="write the JSON report here")
+    ap.add_argument("--junit", dest="junit_out", default=None, help="write a JUnit XML report here")
+    ap.add_argument("--quiet", action="store_true", help="only print the summary line")
+    a = ap.parse_args()
+
+    report = run(a.root, a.tenant_config, a.rules, a.workers, a.json_out, a.junit_out, a.quiet)
+    sys.exit(1 if report["with_errors"] else 0)
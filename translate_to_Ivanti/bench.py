@@ -0,0 +1,239 @@
+"""
+Micro-benchmarks on synthetic bundles.  Run from this folder:
+
+    python bench.py            # everything
+    python bench.py links      # one section
+"""
+import json
+import sys
+import time
+
+import expressions
+from mapping import check_links, compile_bundle, deep_replace, find_placeholders, transform_bundle
+from model import Bundle
+from validators import validate_all, validate_bundle, validate_workflow
+from workflow_graph import WorkflowIndex
+
+
+def _exit_after(bid: str) -> str:
+    # odd ids are vote0007 blocks in synthetic_workflow
+    return "approved" if bid != "B0" and int(bid[1:]) % 2 else "ok"
+
+
+def synthetic_workflow(n_blocks: int) -> dict:
+    """start -> (vote0007 -> update) * k -> stop; every non-approved vote exit goes straight to stop."""
+    blocks = [{"id": "B0", "type": "start", "title": "Start", "properties": {}, "exits": [{"title": "ok"}]}]
+    links = []
+    prev = "B0"
+    stop = f"B{n_blocks - 1}"
+    for i in range(1, n_blocks - 1):
+        bid = f"B{i}"
+        if i % 2:
+            blocks.append({"id": bid, "type": "vote0007", "title": f"Approval {i}",
+                           "properties": {"approvers": {"mode": "group", "group_recid": "<GROUP_REC_ID_IT_KNOWLEDGE>"}},
+                           "exits": [{"title": t} for t in ("approved", "denied", "cancelled", "timedout", "noapprovers")]})
+        else:
+            blocks.append({"id": bid, "type": "update", "title": f"Update {i}",
+                           "properties": {"status": "Approved"}, "exits": [{"title": "ok"}]})
+        links.append({"from": prev, "exit": _exit_after(prev), "to": bid})
+        if i % 2:
+            links.extend({"from": bid, "exit": t, "to": stop} for t in ("denied", "cancelled", "timedout", "noapprovers"))
+        prev = bid
+    blocks.append({"id": stop, "type": "stop", "title": "Stop", "properties": {}, "exits": []})
+    links.append({"from": prev, "exit": _exit_after(prev), "to": stop})
+    return {"blocks": blocks, "links": links, "notifications": [], "status_transitions": []}
+
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def bench_links():
+    def shared(wf):
+        # one index (and one graph analysis) for both checks, as the index= parameters intend
+        idx = WorkflowIndex(wf["blocks"], wf["links"])
+        check_links(wf["blocks"], wf["links"], idx)
+        validate_workflow(wf, idx)
+
+    print("check_links / validate_workflow incl. graph analysis (best of 3)")
+    print(f"{'blocks':>8} {'check_links ms':>15} {'validate ms':>12} {'us/block':>9} {'shared index us/block':>22}")
+    for n in (1_000, 2_500, 5_000, 10_000):
+        wf = synthetic_workflow(n)
+        t_links = timed(check_links, wf["blocks"], wf["links"])
+        t_val = timed(validate_workflow, wf)
+        t_shared = timed(shared, wf)
+        print(f"{n:>8} {t_links * 1e3:>15.2f} {t_val * 1e3:>12.2f} {(t_links + t_val) / n * 1e6:>9.2f} "
+              f"{t_shared / n * 1e6:>22.2f}")
+
+
+def synthetic_bundle(n_fields: int, n_blocks: int) -> dict:
+    """form + workflow with a placeholder in every 10th field and in every vote0007 block."""
+    fields = []
+    for i in range(1, n_fields + 1):
+        fields.append({
+            "internal_name": f"field_{i}", "display_name": f"Field {i}", "description": "",
+            "field_type": "combo" if i % 3 == 0 else "text", "required": False, "read_only": False,
+            "default_value": "<DEFAULT_CATALOG_CATEGORY>" if i % 10 == 0 else None,
+            "auto_fill_expression": None, "required_expression": None, "visibility_expression": None,
+            "validation_list_recid": None, "validation_constraints": None, "sequence_number": i,
+            "options": ["a", "b", "c"] if i % 3 == 0 else None, "notes": None,
+        })
+    return {"form": {"template": {"catalog_item_name": "x", "category": "<DEFAULT_CATALOG_CATEGORY>"}, "fields": fields},
+            "workflow": synthetic_workflow(n_blocks)}
+
+
+PLACEHOLDER_MAP = {"GROUP_REC_ID_IT_KNOWLEDGE": "4F07C98B", "DEFAULT_CATALOG_CATEGORY": "Network"}
+
+
+def bench_placeholders():
+    print("find_placeholders / deep_replace (best of 3)")
+    print(f"{'fields':>8} {'blocks':>8} {'hits':>6} {'find ms':>9} {'replace ms':>11}")
+    for n in (1_000, 10_000, 50_000):
+        bundle = synthetic_bundle(n, n // 5)
+        hits = len(find_placeholders(bundle))
+        t_find = timed(find_placeholders, bundle)
+        t_rep = timed(lambda: deep_replace(bundle, PLACEHOLDER_MAP, []))
+        print(f"{n:>8} {n // 5:>8} {hits:>6} {t_find * 1e3:>9.2f} {t_rep * 1e3:>11.2f}")
+
+    deep = "<GROUP_REC_ID_IT_KNOWLEDGE>"
+    for _ in range(20_000):
+        deep = {"next": [deep]}
+    t = timed(find_placeholders, deep)
+    print(f"nesting depth 40000 (past the recursion limit): {t * 1e3:.2f} ms")
+
+
+def bench_tenants():
+    n_tenants = 50
+    bundle = synthetic_bundle(10_000, 2_000)
+    maps = [{k: f"{v}-{t}" for k, v in PLACEHOLDER_MAP.items()} for t in range(n_tenants)]
+    print(f"render one 10k-field bundle for {n_tenants} tenants")
+
+    t = time.perf_counter()
+    for m in maps:
+        json.dumps(deep_replace(bundle, m, []), ensure_ascii=False, indent=2)
+    print(f"  deep_replace + json.dumps per tenant: {(time.perf_counter() - t) * 1e3:>9.1f} ms")
+
+    t = time.perf_counter()
+    plan = compile_bundle(bundle)
+    plan.render_json(maps[0])
+    t_compile = time.perf_counter() - t
+    t = time.perf_counter()
+    for m in maps:
+        plan.render_json(m, [])
+    print(f"  compile once + render_json:           {(t_compile + time.perf_counter() - t) * 1e3:>9.1f} ms"
+          f"  (compile {t_compile * 1e3:.1f} ms)")
+
+    t = time.perf_counter()
+    for m in maps:
+        plan.render(m, [])
+    print(f"  plan.render (objects):                {(time.perf_counter() - t) * 1e3:>9.1f} ms")
+
+
+class _CountingSink:
+    def __init__(self):
+        self.chars = 0
+
+    def write(self, s):
+        self.chars += len(s)
+
+
+def bench_export():
+    import tracemalloc
+
+    print("transform_bundle streaming export (peak = traced allocations during the export)")
+    print(f"{'fields':>8} {'blocks':>8} {'out MB':>8} {'ms':>9} {'peak KB':>9}")
+    for n in (1_000, 10_000, 50_000):
+        bundle = synthetic_bundle(n, n // 5)
+        sink = _CountingSink()
+        t = time.perf_counter()
+        transform_bundle(bundle["form"], bundle["workflow"], sink, PLACEHOLDER_MAP, [])
+        elapsed = time.perf_counter() - t
+
+        tracemalloc.start()
+        transform_bundle(bundle["form"], bundle["workflow"], _CountingSink(), PLACEHOLDER_MAP, None)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{n:>8} {n // 5:>8} {sink.chars / 1e6:>8.1f} {elapsed * 1e3:>9.1f} {peak / 1024:>9.0f}")
+
+
+OFFERING = {"catalog_item_name": "x", "description": "d", "category": "c", "delivery_target_days": 1,
+            "user_permissions": {"can_cancel": True, "can_edit": True},
+            "publishing_scope": {"mode": "all_users", "groups": [], "users": []}}
+TENANT = {"groups": {}, "email_templates": {}}
+
+
+def bench_model():
+    import gc
+    import tracemalloc
+
+    print("dict bundle vs typed model (model.Bundle)")
+    print(f"{'fields':>8} {'dict MB':>8} {'model MB':>9} {'parse ms':>9} {'validate dicts ms':>18} {'validate model ms':>18}")
+    for n in (1_000, 10_000, 50_000):
+        text = json.dumps(synthetic_bundle(n, n // 5))
+
+        tracemalloc.start()
+        raw = json.loads(text)
+        dict_mb = tracemalloc.get_traced_memory()[0] / 1e6
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        model = Bundle.from_json(OFFERING, *json.loads(text).values())
+        gc.collect()
+        model_mb = tracemalloc.get_traced_memory()[0] / 1e6
+        tracemalloc.stop()
+
+        t_parse = timed(lambda: Bundle.from_json(OFFERING, raw["form"], raw["workflow"]))
+        t_dicts = timed(validate_all, OFFERING, raw["form"], raw["workflow"], TENANT)
+        t_model = timed(validate_bundle, model, TENANT)
+        print(f"{n:>8} {dict_mb:>8.1f} {model_mb:>9.1f} {t_parse * 1e3:>9.1f} {t_dicts * 1e3:>18.1f} {t_model * 1e3:>18.1f}")
+
+
+# the real BRD expressions: a few strings repeated on many fields
+EXPRESSIONS = [
+    "$( submit_on_behalf == true )",
+    "$(false)",
+] + [f"$( submit_on_behalf ? LookupUserField(employee_id,'{a}') : CurrentUser('{a}') )"
+     for a in ("FullName", "Email", "Phone", "Extension", "LoginID", "ManagerName")]
+
+
+def bench_expressions():
+    def analyze(values):
+        for v in values:
+            expressions.references(v)
+            expressions.semantic_key(v)
+
+    def cold(values):
+        for fn in (expressions.parse, expressions.references, expressions.semantic_key):
+            fn.cache_clear()
+        analyze(values)
+
+    print("expression parse + reference/semantic analysis, 8 distinct expressions (best of 3)")
+    print(f"{'exprs':>8} {'uncached us/expr':>17} {'cached us/expr':>15}")
+    for n in (1_000, 10_000, 50_000):
+        values = [EXPRESSIONS[i % len(EXPRESSIONS)] for i in range(n)]
+        # uncached: every value parsed as if it were new (what string-by-string analysis would cost)
+        t_raw = timed(lambda: [cold([v]) for v in values])
+        t_hot = timed(cold, values)
+        print(f"{n:>8} {t_raw / n * 1e6:>17.2f} {t_hot / n * 1e6:>15.2f}")
+
+
+SECTIONS = {
+    "links": bench_links,
+    "placeholders": bench_placeholders,
+    "tenants": bench_tenants,
+    "export": bench_export,
+    "model": bench_model,
+    "expressions": bench_expressions,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(SECTIONS)
+    for name in names:
+        SECTIONS[name]()
+        print()
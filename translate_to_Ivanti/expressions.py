@@ -0,0 +1,258 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Set, Tuple
+
+from workflow_graph import _back_edges
+
+# Parser for the Ivanti "$( ... )" expression language used in required_expression,
+# visibility_expression and auto_fill_expression, e.g.
+#   $( submit_on_behalf ? LookupUserField(employee_id,'FullName') : CurrentUser('FullName') )
+#
+# Parsed expressions are plain nested tuples (hashable, immutable), so parse() can be memoized per
+# distinct string and the results shared: the same handful of expressions repeat across hundreds of
+# fields and offerings.
+#
+#   ("lit", value)            number / string / true / false / null
+#   ("name", ident)           field reference (or dotted member, e.g. CurrentUser.Phone)
+#   ("call", fname, (args))   function call
+#   ("not", x) ("neg", x)     unary ! / not, unary -
+#   ("op", op, a, b)          binary operator, `and`/`or` folded into &&/||
+#   ("cond", c, a, b)         c ? a : b
+#
+# Only values that are a whole $( ... ) are expressions; anything else is literal text.
+
+EXPR_ATTRS = ("required_expression", "visibility_expression", "auto_fill_expression")
+
+_WRAP_RE = re.compile(r"^\s*\$\((.*)\)\s*$", re.S)
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<num>\d+(?:\.\d+)?)
+      | (?P<str>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+      | (?P<name>[A-Za-z_][\w.]*)
+      | (?P<op>==|!=|<=|>=|&&|\|\||[-+*/%<>!?:(),])
+    )""", re.X)
+_ESC_RE = re.compile(r"\\(.)")
+
+_WORD_OPS = {"and": "&&", "or": "||", "not": "!"}
+_LITERALS = {"true": True, "false": False, "null": None}
+
+# binary operators by binding power (higher binds tighter); ?: sits below all of them
+_BINARY = {
+    "||": 1, "&&": 2,
+    "==": 3, "!=": 3,
+    "<": 4, ">": 4, "<=": 4, ">=": 4,
+    "+": 5, "-": 5,
+    "*": 6, "/": 6, "%": 6,
+}
+_COMMUTATIVE = {"||", "&&", "==", "!=", "*"}
+
+
+class ExprError(ValueError):
+    pass
+
+
+def is_expression(s: Any) -> bool:
+    return isinstance(s, str) and _WRAP_RE.match(s) is not None
+
+
+def _tokenize(text: str) -> List[Tuple[str, Any]]:
+    toks: List[Tuple[str, Any]] = []
+    pos, end = 0, len(text.rstrip())
+    while pos < end:
+        m = _TOKEN_RE.match(text, pos)
+        if m is None or m.end() == pos:
+            raise ExprError(f"unexpected character {text[pos:].strip()[:1]!r} at {pos}")
+        pos = m.end()
+        kind = m.lastgroup
+        val = m.group(kind)
+        if kind == "num":
+            toks.append(("lit", float(val) if "." in val else int(val)))
+        elif kind == "str":
+            toks.append(("lit", _ESC_RE.sub(r"\1", val[1:-1])))
+        elif kind == "name":
+            low = val.lower()
+            if low in _LITERALS:
+                toks.append(("lit", _LITERALS[low]))
+            elif low in _WORD_OPS:
+                toks.append(("op", _WORD_OPS[low]))
+            else:
+                toks.append(("name", val))
+        else:
+            toks.append(("op", val))
+    toks.append(("end", None))
+    return toks
+
+
+class _Parser:
+    __slots__ = ("toks", "i")
+
+    def __init__(self, toks):
+        self.toks = toks
+        self.i = 0
+
+    def peek(self):
+        return self.toks[self.i]
+
+    def take(self, op=None):
+        tok = self.toks[self.i]
+        if op is not None and tok != ("op", op):
+            raise ExprError(f"expected {op!r}, got {tok[1]!r}" if tok[0] != "end" else f"expected {op!r} at end")
+        self.i += 1
+        return tok
+
+    def expr(self):
+        cond = self.binary(1)
+        if self.peek() == ("op", "?"):
+            self.take()
+            a = self.expr()
+            self.take(":")
+            b = self.expr()
+            return ("cond", cond, a, b)
+        return cond
+
+    def binary(self, min_bp):
+        left = self.unary()
+        while True:
+            kind, op = self.peek()
+            bp = _BINARY.get(op) if kind == "op" else None
+            if bp is None or bp < min_bp:
+                return left
+            self.take()
+            left = ("op", op, left, self.binary(bp + 1))
+
+    def unary(self):
+        kind, val = self.peek()
+        if kind == "op" and val == "!":
+            self.take()
+            return ("not", self.unary())
+        if kind == "op" and val == "-":
+            self.take()
+            return ("neg", self.unary())
+        return self.primary()
+
+    def primary(self):
+        kind, val = self.take()
+        if kind == "lit":
+            return ("lit", val)
+        if kind == "name":
+            if self.peek() == ("op", "("):
+                self.take()
+                args = []
+                if self.peek() != ("op", ")"):
+                    args.append(self.expr())
+                    while self.peek() == ("op", ","):
+                        self.take()
+                        args.append(self.expr())
+                self.take(")")
+                return ("call", val, tuple(args))
+            return ("name", val)
+        if (kind, val) == ("op", "("):
+            inner = self.expr()
+            self.take(")")
+            return inner
+        raise ExprError("unexpected end of expression" if kind == "end" else f"unexpected {val!r}")
+
+
+@lru_cache(maxsize=4096)
+def parse(s: str):
+    """Parse one $( ... ) expression; memoized per distinct string. Raises ExprError."""
+    m = _WRAP_RE.match(s) if isinstance(s, str) else None
+    if m is None:
+        raise ExprError("not a $( ... ) expression")
+    p = _Parser(_tokenize(m.group(1)))
+    if p.peek()[0] == "end":
+        raise ExprError("empty expression")
+    node = p.expr()
+    if p.peek()[0] != "end":
+        raise ExprError(f"unexpected {p.peek()[1]!r} after expression")
+    return node
+
+
+def _canon(node):
+    tag = node[0]
+    if tag == "lit":
+        return ("lit", node[1], type(node[1]).__name__)   # keeps true and 1 apart (True == 1 in a tuple compare)
+    if tag == "name":
+        return node
+    if tag == "call":
+        return ("call", node[1], tuple(_canon(a) for a in node[2]))
+    if tag == "not":
+        x = _canon(node[1])
+        return x[1] if x[0] == "not" else ("not", x)        # !!x -> x
+    if tag == "neg":
+        return ("neg", _canon(node[1]))
+    if tag == "cond":
+        return ("cond", _canon(node[1]), _canon(node[2]), _canon(node[3]))
+
+    op, a, b = node[1], _canon(node[2]), _canon(node[3])
+    if op in ("==", "!="):
+        # x == true -> x, x == false -> !x (and the != forms)
+        for x, y in ((a, b), (b, a)):
+            if y[0] == "lit" and isinstance(y[1], bool):
+                if y[1] == (op == "=="):
+                    return x
+                return x[1] if x[0] == "not" else ("not", x)   # x is canonical already
+    if op in ("&&", "||"):
+        # flatten a && (b && c) and sort, so operand order and grouping don't matter
+        parts = []
+        for x in (a, b):
+            parts.extend(x[2] if x[0] == "all" and x[1] == op else (x,))
+        return ("all", op, tuple(sorted(set(parts), key=repr)))
+    if op in _COMMUTATIVE:
+        a, b = sorted((a, b), key=repr)
+    return ("op", op, a, b)
+
+
+@lru_cache(maxsize=4096)
+def semantic_key(s: Any):
+    """
+    Comparison key: equal keys mean equivalent expressions (whitespace, quoting, grouping, operand
+    order of && || == != *, `x == true` vs `x`). Values that are not parseable expressions fall back
+    to their whitespace-normalized text.
+    """
+    try:
+        return _canon(parse(s))
+    except ExprError:
+        from rules import norm_expr
+        return ("text", norm_expr(s))
+
+
+def equivalent(a: Any, b: Any) -> bool:
+    try:
+        return semantic_key(a) == semantic_key(b)
+    except TypeError:   # unhashable JSON value (list / dict)
+        return False
+
+
+def _walk_refs(node, out: Set[str]) -> None:
+    stack = [node]
+    while stack:
+        n = stack.pop()
+        tag = n[0]
+        if tag == "name":
+            if "." not in n[1]:           # dotted names are object members, not form fields
+                out.add(n[1])
+        elif tag == "call":
+            stack.extend(n[2])
+        elif tag in ("not", "neg"):
+            stack.append(n[1])
+        elif tag == "op":
+            stack.extend(n[2:])
+        elif tag == "cond":
+            stack.extend(n[1:])
+
+
+@lru_cache(maxsize=4096)
+def references(s: str) -> frozenset:
+    """Field names an expression reads. Raises ExprError like parse()."""
+    out: Set[str] = set()
+    _walk_refs(parse(s), out)
+    return frozenset(out)
+
+
+def dependency_cycles(deps: Dict[str, Set[str]]) -> List[Tuple[str, str]]:
+    """(field, referenced field) for each reference that closes a loop in the field -> field graph."""
+    order = {name: i for i, name in enumerate(deps)}
+    succ = [[order[d] for d in sorted(targets) if d in order] for targets in deps.values()]
+    names = list(deps)
+    return [(names[u], names[v]) for u, v in _back_edges(succ)]
@@ -1,73 +1,152 @@
 import json
+import threading
 from pathlib import Path
-from typing import Dict , Tuple, Any
+from typing import Dict , Tuple, Any, Callable
 
 class LoadError(Exception):
     pass
 
 
-def read_json(path: Path) -> Dict[str , Any]:
+# Fast-parse backend: orjson / msgspec when installed, stdlib json otherwise.
+def _stdlib_loads(raw: bytes):
+    return json.loads(raw)
+
+
+def _pick_backend() -> Tuple[str, Callable[[bytes], Any]]:
+    try:
+        import orjson
+        return "orjson", orjson.loads
+    except ImportError:
+        pass
+    try:
+        import msgspec
+        return "msgspec", msgspec.json.decode
+    except ImportError:
+        pass
+    return "json", _stdlib_loads
+
+
+JSON_BACKEND, _loads = _pick_backend()
+
+
+def set_json_backend(name: str) -> None:
+    """Force "orjson", "msgspec" or "json" (e.g. to compare backends)."""
+    global JSON_BACKEND, _loads
+    if name == "orjson":
+        import orjson
+        _loads = orjson.loads
+    elif name == "msgspec":
+        import msgspec
+        _loads = msgspec.json.decode
+    elif name == "json":
+        _loads = _stdlib_loads
+    else:
+        raise ValueError(f"Unknown JSON backend: {name}")
+    JSON_BACKEND = name
+
+
+# parsed files keyed by path, reused while (mtime_ns, size) is unchanged. Opt-in (cached=True) for
+# long-running callers such as watch mode; cached objects are shared between callers: treat them as read-only.
+_cache: Dict[str, Tuple[int, int, Dict[str, Any]]] = {}
+_cache_lock = threading.Lock()
+
+
+def clear_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
+
+
+def read_json(path: Path, cached: bool = False) -> Dict[str , Any]:
     if not path.exists():
         raise LoadError(f"File not found: {path}")
 
+    key = str(path.resolve())
+    st = path.stat()
+    if cached:
+        with _cache_lock:
+            hit = _cache.get(key)
+        if hit and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+            return hit[2]
+
     try:
-        with path.open("r" , encoding="utf-8") as f:
-            data = json.load(f)
+        data = _loads(path.read_bytes())
 
-    except json.JSONDecodeError as e:
+    except Exception as e:   # json.JSONDecodeError / orjson.JSONDecodeError / msgspec.DecodeError
         raise LoadError(f"Invalid JSON in {path}: {e}") from e
-    
+
     if not isinstance(data, dict):
         raise LoadError(f"Top-level JSON must be an object in {path}")
-    
+
+    if cached:
+        with _cache_lock:
+            _cache[key] = (st.st_mtime_ns, st.st_size, data)
     return data
 
 
 
+def _check_form(form: Dict[str, Any]) -> None:
+    if "template" not in form or "fields" not in form:
+        raise LoadError("form.json must contain 'template' and 'fields' keys.")
+    if not isinstance(form["fields"], list):
+        raise LoadError("form.fields must be a list.")
+
+
+def _check_workflow(workflow: Dict[str, Any]) -> None:
+    if "blocks" not in workflow or "links" not in workflow:
+        raise LoadError("workflow.json must contain 'blocks' and 'links' keys.")
+
+
+def _merge_fields(form: Dict[str, Any], fields_path, cached: bool = False) -> Dict[str, Any]:
+    fields_obj = read_json(Path(fields_path), cached)
+    if "fields" in fields_obj and isinstance(fields_obj["fields"], list):
+        form = dict(form)   # the parsed form may be a shared cache entry, don't modify it
+        form["fields"] = fields_obj["fields"]
+    return form
+
+
+
 def load_input_json(offering_path : str | Path ,
                      form_path : str | Path ,
                        workflow_path: str| Path,
-                       fields_path: str | Path | None = None)-> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
-    
-    offering = read_json(Path(offering_path))
-    form = read_json(Path(form_path))
-    workflow = read_json(Path(workflow_path))
+                       fields_path: str | Path | None = None,
+                       cached: bool = False)-> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+
+    offering = read_json(Path(offering_path), cached)
+    form = read_json(Path(form_path), cached)
+    workflow = read_json(Path(workflow_path), cached)
 
 
     # this checks for validate the structures of json files like fields have all fields and form have the offering and fields and workflow ...
     # If missing -> this means the generated JSON is broken.
     if fields_path is not None:
+        form = _merge_fields(form, fields_path, cached)
 
-        fields_obj = read_json(Path(fields_path))
-        if "fields" in fields_obj and isinstance(fields_obj["fields"], list):
-            form["fields"] = fields_obj["fields"]
+    _check_form(form)
+    _check_workflow(workflow)
 
+    return offering, form, workflow
 
-    if "template" not in form or "fields" not in form:
-        raise LoadError("form.json must contain 'template' and 'fields' keys.")
-    if not isinstance(form["fields"], list):
-        raise LoadError("form.fields must be a list.")
 
 
-    if "blocks" not in workflow or "links" not in workflow:
-        raise LoadError("workflow.json must contain 'blocks' and 'links' keys.")
-    
-    return offering, form, workflow
+def load_model(offering_path: str | Path, form_path: str | Path, workflow_path: str | Path,
+               fields_path: str | Path | None = None):
+    """load_input_json + one parse into the typed model (model.Bundle) with its name/id indexes."""
+    from model import Bundle
+    return Bundle.from_json(*load_input_json(offering_path, form_path, workflow_path, fields_path))
+
 
-        
 
 # json file where it is go "they act as bridge between the  my output logic (json files) with Ivanti system"
 
-def load_tenant_config(tenant_config_path: str | Path) -> Dict[str , Any]: 
+def load_tenant_config(tenant_config_path: str | Path, cached: bool = False) -> Dict[str , Any]:
     """
     Load tenant config with IDs/templates used later in mapping.
     Must contain: 'groups' and 'email_templates'.
     """
 
-    config = read_json(Path(tenant_config_path))
+    config = read_json(Path(tenant_config_path), cached)
 
     if "groups" not in config or "email_templates" not in config:
         raise LoadError("tenant_config.json must contain 'groups' and 'email_templates' objects.")
-    
-    return config
 
+    return config
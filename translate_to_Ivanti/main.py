@@ -1,7 +1,9 @@
 import json
+import sys
 from pathlib import Path
 from loaders import load_input_json, load_tenant_config
 from validators import validate_all
+from mapping import build_placeholder_mapping, transform_bundle
 
 def main():
     base = Path("structured")  
@@ -16,6 +18,7 @@ def main():
     tenant_cfg = load_tenant_config(base / "tenant_config.json")
 
 
+    # one-shot run: the validators read the dicts directly (building the typed model would cost more than it saves)
     issues = validate_all(offering, form, workflow, tenant_cfg)
     if issues:
         print("\n Validation Report:")
@@ -25,5 +28,21 @@ def main():
         print(" All files validated successfully!")
 
 
+    if any(i["severity"] == "error" for i in issues):
+        print("\n Not exported: fix the errors above first.")
+        return
+
+    # re-export in Ivanti naming with the tenant's IDs/templates filled in
+    _, audit = transform_bundle(form, workflow, base / "ivanti_export.json",
+                                mapping=build_placeholder_mapping(tenant_cfg), audit=[])
+    unmapped = [a["path"] for a in audit if a.get("warning")]
+    print(f"\n Exported: {base / 'ivanti_export.json'} ({len(audit) - len(unmapped)} placeholders mapped, {len(unmapped)} unmapped)")
+
+
 if __name__ == "__main__":
-    main()
+    if "--watch" in sys.argv[1:]:
+        # keep the bundle in memory and re-validate whatever file changes (see watch.py)
+        from watch import watch
+        watch("structured")
+    else:
+        main()
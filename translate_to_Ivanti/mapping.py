@@ -1,57 +1,48 @@
-import re
+import json
+from placeholders import PlaceholderPlan, format_path, resolve, scan
+from workflow_graph import WorkflowIndex
 
 
 def find_placeholders(obj, path="$", hits=None):
     if hits is None: hits = []
-    if isinstance(obj, dict):
-        for k,v in obj.items():
-            find_placeholders(v, f"{path}.{k}", hits)
-    elif isinstance(obj, list):
-        for i,v in enumerate(obj):
-            find_placeholders(v, f"{path}[{i}]", hits)
-    elif isinstance(obj, str) and re.fullmatch(r"<[^>]+>", obj):
-        hits.append({"path": path, "value": obj})
+    hits.extend({"path": format_path(keys, path), "value": v} for keys, v, _ in scan(obj))
     return hits
 
 
 
 # this check every link["from"] and link["to"] points to a real block ID and it is counts outgoing links for each block
-def check_links(blocks, links):
-    ids = {b["id"] for b in blocks}
+# plus the graph checks from workflow_graph (cycles, dead ends, unreachable blocks, exit wiring)
+def check_links(blocks, links, index=None):
+    idx = index or WorkflowIndex(blocks, links)
     errors, warnings = [], []
     for L in links:
-        if L["from"] not in ids: errors.append(f"Link from '{L['from']}' missing block")
-        if L["to"]   not in ids: errors.append(f"Link to '{L['to']}' missing block")
-
-    out = {b["id"]:0 for b in blocks}
-    for L in links: out[L["from"]] = out.get(L["from"], 0) + 1
-    for bid, cnt in out.items():
-        btype = next(b["type"] for b in blocks if b["id"]==bid)
-        if btype != "stop" and cnt == 0:
+        if not idx.has(L["from"]): errors.append(f"Link from '{L['from']}' missing block")
+        if not idx.has(L["to"]):   errors.append(f"Link to '{L['to']}' missing block")
+
+    has_stop = False
+    for bid, b in idx.by_id.items():
+        if b.get("type") == "stop":
+            has_stop = True
+        elif not idx.out[bid]:
             warnings.append(f"Block '{bid}' has no outgoing links")
+    if not has_stop:
+        errors.append("Workflow has no stop block")   # the graph report skips dead ends then
+
+    g = idx.report()   # cached on the index, so validate_workflow with the same index doesn't walk it again
+    for frm, to in g.cycles:           errors.append(f"Link '{frm}' -> '{to}' closes a cycle")
+    for bid in g.dead_ends:            errors.append(f"Block '{bid}' cannot reach a stop block")
+    for bid, ex in g.duplicate_exits:  errors.append(f"Block '{bid}' exit '{ex}' is linked more than once")
+    for bid in g.unreachable:          warnings.append(f"Block '{bid}' is not reachable from start")
+    for bid, ex in g.vote_exits_unlinked: warnings.append(f"Block '{bid}' vote0007 exit '{ex}' has no link")
     return errors, warnings
 
 
 
 
 # here the real replace between the default placeholder with the real one
+# (returns a copy-on-write result: untouched subtrees are shared with obj, obj itself is not modified)
 def deep_replace(obj, mapping, audit, path="$"):
-
-    if isinstance(obj, dict):
-        return {k: deep_replace(v, mapping, audit, f"{path}.{k}") for k, v in obj.items()}
-    
-    if isinstance(obj, list):
-        return [deep_replace(v, mapping, audit, f"{path}[{i}]") for i, v in enumerate(obj)]
-    
-    if isinstance(obj, str) and obj.startswith("<") and obj.endswith(">"):
-        key = obj.strip("<>")
-        if key in mapping:
-            audit.append({"path": path, "old": obj, "new": mapping[key]})
-            return mapping[key]
-        else:
-            audit.append({"path": path, "old": obj, "new": None, "warning": "unmapped_placeholder"})
-
-    return obj
+    return resolve(obj, mapping, audit, path)
 
 
 
@@ -78,3 +69,132 @@ def build_placeholder_mapping(tenant_cfg: dict) -> dict:
         "DEFAULT_PUBLISHING_MODE":   catalog.get("publishing_mode", "")
     }
 
+
+
+# one generated bundle rendered for many tenants: compile the placeholder slots once, then patch per tenant
+def compile_bundle(obj, path="$"):
+    return PlaceholderPlan(obj, path)
+
+
+def render_tenants(plan, tenant_cfgs, as_json=False):
+    """Yields (tenant_name, rendered, audit) for each {name: tenant_cfg}; rendered is a JSON string if as_json."""
+    for name, cfg in tenant_cfgs.items():
+        audit = []
+        mapping = build_placeholder_mapping(cfg)
+        out = plan.render_json(mapping, audit) if as_json else plan.render(mapping, audit)
+        yield name, out, audit
+
+
+
+
+# internal authoring names -> Ivanti names (top-level keys of each object only; unknown keys pass through)
+IVANTI_BUNDLE_KEYS = {"template": "CatalogItem", "fields": "FormFields", "workflow": "Workflow"}
+
+IVANTI_CATALOG_KEYS = {
+    "catalog_item_name": "Name",
+    "description": "Description",
+    "category": "Category",
+    "delivery_target_days": "DeliveryTargetDays",
+    "user_permissions": "UserPermissions",
+    "publishing_scope": "PublishingScope",
+    "missing_fields": "MissingFields",
+}
+
+IVANTI_FIELD_KEYS = {
+    "internal_name": "Name",
+    "display_name": "DisplayName",
+    "description": "Description",
+    "field_type": "Type",
+    "required": "Required",
+    "read_only": "ReadOnly",
+    "default_value": "DefaultValue",
+    "auto_fill_expression": "AutoFillExpression",
+    "required_expression": "RequiredExpression",
+    "visibility_expression": "VisibilityExpression",
+    "validation_list_recid": "ValidationListRecId",
+    "validation_constraints": "ValidationConstraints",
+    "sequence_number": "SequenceNumber",
+    "options": "Options",
+    "notes": "Notes",
+}
+
+IVANTI_WORKFLOW_KEYS = {
+    "blocks": "Blocks",
+    "links": "Links",
+    "notifications": "Notifications",
+    "status_transitions": "StatusTransitions",
+}
+
+
+def _rename(obj, names):
+    if not isinstance(obj, dict):
+        return obj
+    return {names.get(k, k): v for k, v in obj.items()}
+
+
+def transform_bundle(form, workflow=None, out=None, mapping=None, audit=None):
+    """
+    Export {"CatalogItem": ..., "FormFields": [...], "Workflow": {...}} in Ivanti naming.
+
+    out is a path or anything with .write(str) (an open file, sock.makefile("w"), ...); items are
+    resolved and written one at a time, so memory stays flat however many fields/blocks there are.
+    mapping (from build_placeholder_mapping) resolves placeholders, recorded in audit.
+    Returns (export, audit): export is the dict when out=None and None when it was written to out.
+    """
+    if out is None:
+        chunks = []
+        transform_bundle(form, workflow, _ListWriter(chunks), mapping, audit)
+        return json.loads("".join(chunks)), audit
+
+    if isinstance(out, (str, bytes)) or hasattr(out, "__fspath__"):
+        with open(out, "w", encoding="utf-8") as f:
+            return transform_bundle(form, workflow, f, mapping, audit)
+
+    trail = audit if audit is not None else _NoAudit()   # keep memory flat when nobody wants the trail
+    mapping = mapping or {}
+
+    def item(obj, path, names):
+        return json.dumps(_rename(resolve(obj, mapping, trail, path), names), ensure_ascii=False)
+
+    def stream_list(items, path, names, pad="\n    "):
+        out.write("[")
+        for i, obj in enumerate(items or []):
+            if i:
+                out.write(",")
+            out.write(pad + item(obj, f"{path}[{i}]", names))
+        out.write("]")
+
+    sections = list(form.items())
+    if workflow is not None:
+        sections.append(("workflow", workflow))
+
+    out.write("{")
+    for n, (key, value) in enumerate(sections):
+        out.write(("," if n else "") + "\n  " + json.dumps(IVANTI_BUNDLE_KEYS.get(key, key)) + ": ")
+        if key == "fields":
+            stream_list(value, "$.fields", IVANTI_FIELD_KEYS)
+        elif key == "workflow":
+            out.write("{")
+            for m, (wk, wv) in enumerate(value.items()):
+                out.write(("," if m else "") + "\n    " + json.dumps(IVANTI_WORKFLOW_KEYS.get(wk, wk)) + ": ")
+                if isinstance(wv, list):
+                    stream_list(wv, f"$.workflow.{wk}", {}, pad="\n      ")
+                else:
+                    out.write(item(wv, f"$.workflow.{wk}", {}))
+            out.write("\n  }")
+        elif key == "template":
+            out.write(item(value, "$.template", IVANTI_CATALOG_KEYS))
+        else:
+            out.write(item(value, f"$.{key}", {}))
+    out.write("\n}\n")
+    return None, audit
+
+
+class _NoAudit:
+    def append(self, entry):
+        pass
+
+
+class _ListWriter:
+    def __init__(self, chunks):
+        self.write = chunks.append
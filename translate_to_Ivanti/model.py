@@ -0,0 +1,202 @@
+from dataclasses import dataclass, fields as dc_fields
+from typing import Any, Dict, List, Tuple
+
+# Typed, slotted in-memory model of offering / form / workflow.
+#
+# Values are stored as they came from JSON (no coercion), so the validators can still report bad types.
+# Every record keeps the keys it was parsed from in `order` (absent keys are not in it, unknown keys
+# live in `extra`), which is what makes to_dict() lossless - same keys, same order, same values.
+
+_ORDERS: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+_UNKNOWN: Dict[Tuple[type, Tuple[str, ...]], Tuple[str, ...]] = {}   # (record class, key layout) -> keys kept in extra
+
+
+def _intern(keys) -> Tuple[str, ...]:
+    # thousands of fields share a handful of key layouts; keep one tuple per layout
+    t = tuple(keys)
+    return _ORDERS.setdefault(t, t)
+
+
+class Record:
+    __slots__ = ()
+    _ATTRS: Dict[str, str] = {}   # json key -> attribute name (filled by _record)
+    _KEYS: Tuple[str, ...] = ()   # json keys in attribute order
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]):
+        if not isinstance(d, dict):
+            raise ValueError(f"{cls.__name__} must be a JSON object, got {type(d).__name__}")
+        order = _intern(d)
+        unknown = _UNKNOWN.get((cls, order))
+        if unknown is None:
+            unknown = _UNKNOWN[(cls, order)] = tuple(k for k in order if k not in cls._ATTRS)
+        extra = {k: d[k] for k in unknown} if unknown else None
+        return cls(*map(d.get, cls._KEYS), extra, order)
+
+    def has(self, key: str) -> bool:
+        return key in self.order
+
+    __contains__ = has
+
+    def get(self, key: str, default=None):
+        # dict-style read, so the validators and WorkflowIndex take records and raw dicts alike
+        attr = self._ATTRS.get(key)
+        if attr is not None:
+            v = getattr(self, attr)
+            if v is not None or key in self.order:   # absent keys are stored as None
+                return v
+            return default
+        return self.extra[key] if self.extra and key in self.extra else default
+
+    def to_dict(self) -> Dict[str, Any]:
+        attrs = self._ATTRS
+        return {k: (getattr(self, attrs[k]) if k in attrs else self.extra[k]) for k in self.order}
+
+
+def _record(cls):
+    """@dataclass(slots=True) plus the json-key -> attribute table used by from_dict / to_dict."""
+    cls = dataclass(slots=True)(cls)
+    cls._ATTRS = {f.name.rstrip("_"): f.name for f in dc_fields(cls) if f.name not in ("extra", "order")}
+    cls._KEYS = tuple(cls._ATTRS)
+    return cls
+
+
+@_record
+class Offering(Record):
+    catalog_item_name: Any = None
+    description: Any = None
+    category: Any = None
+    delivery_target_days: Any = None
+    user_permissions: Any = None
+    publishing_scope: Any = None
+    missing_fields: Any = None
+    extra: Dict[str, Any] | None = None
+    order: Tuple[str, ...] = ()
+
+
+@_record
+class FormField(Record):
+    internal_name: Any = None
+    display_name: Any = None
+    description: Any = None
+    field_type: Any = None
+    required: Any = None
+    read_only: Any = None
+    default_value: Any = None
+    auto_fill_expression: Any = None
+    required_expression: Any = None
+    visibility_expression: Any = None
+    validation_list_recid: Any = None
+    validation_constraints: Any = None
+    sequence_number: Any = None
+    options: Any = None
+    notes: Any = None
+    extra: Dict[str, Any] | None = None
+    order: Tuple[str, ...] = ()
+
+
+@_record
+class Block(Record):
+    id: Any = None
+    type: Any = None
+    title: Any = None
+    properties: Any = None
+    exits: Any = None
+    extra: Dict[str, Any] | None = None
+    order: Tuple[str, ...] = ()
+
+
+@_record
+class Link(Record):
+    from_: Any = None
+    exit: Any = None
+    to: Any = None
+    extra: Dict[str, Any] | None = None
+    order: Tuple[str, ...] = ()
+
+
+@_record
+class StatusTransition(Record):
+    from_: Any = None
+    on: Any = None
+    to: Any = None
+    extra: Dict[str, Any] | None = None
+    order: Tuple[str, ...] = ()
+
+
+
+
+def _records(cls, value):
+    # a non-list stays raw so the validators can report it
+    return [cls.from_dict(x) for x in value] if isinstance(value, list) else value
+
+
+@dataclass(slots=True)
+class Form:
+    template: Any
+    fields: List[FormField] | Any
+    extra: Dict[str, Any]
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Form":
+        flds = _records(FormField, d.get("fields"))
+        # extra keeps every top-level key in order; the parsed ones are swapped out so the raw dicts can be freed
+        return cls(d.get("template"), flds, {k: (None if k in ("template", "fields") else v) for k, v in d.items()})
+
+    def to_dict(self) -> Dict[str, Any]:
+        out = dict(self.extra)   # original key order; template/fields are swapped back in
+        if "template" in out:
+            out["template"] = self.template
+        if "fields" in out:
+            out["fields"] = [f.to_dict() for f in self.fields] if isinstance(self.fields, list) else self.fields
+        return out
+
+
+_WORKFLOW_PARSED = ("blocks", "links", "status_transitions")
+
+
+@dataclass(slots=True)
+class Workflow:
+    blocks: List[Block] | Any
+    links: List[Link] | Any
+    status_transitions: List[StatusTransition] | Any
+    extra: Dict[str, Any]
+    index: Any = None   # workflow_graph.WorkflowIndex, built once in from_dict
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Workflow":
+        from workflow_graph import WorkflowIndex
+
+        blocks = _records(Block, d.get("blocks"))
+        links = _records(Link, d.get("links"))
+        sts = d.get("status_transitions")
+        sts = [StatusTransition.from_dict(t) if isinstance(t, dict) else t for t in sts] if isinstance(sts, list) else sts
+        wf = cls(blocks, links, sts, {k: (None if k in _WORKFLOW_PARSED else v) for k, v in d.items()})
+        if isinstance(blocks, list) and isinstance(links, list):
+            wf.index = WorkflowIndex(blocks, links)
+        return wf
+
+    @property
+    def notifications(self):
+        return self.extra.get("notifications", [])
+
+    def to_dict(self) -> Dict[str, Any]:
+        out = dict(self.extra)
+        for key, value in zip(_WORKFLOW_PARSED, (self.blocks, self.links, self.status_transitions)):
+            if key in out:
+                out[key] = [x.to_dict() if isinstance(x, Record) else x for x in value] if isinstance(value, list) else value
+        return out
+
+
+@dataclass(slots=True)
+class Bundle:
+    offering: Offering
+    form: Form
+    workflow: Workflow
+
+    @classmethod
+    def from_json(cls, offering: Dict[str, Any], form: Dict[str, Any], workflow: Dict[str, Any]) -> "Bundle":
+        return cls(Offering.from_dict(offering), Form.from_dict(form), Workflow.from_dict(workflow))
+
+    def to_json(self) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+        return self.offering.to_dict(), self.form.to_dict(), self.workflow.to_dict()
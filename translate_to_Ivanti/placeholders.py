@@ -0,0 +1,160 @@
+import json
+import re
+from typing import Any, Dict, List, Tuple
+
+# "<GROUP_REC_ID_IT_KNOWLEDGE>" -> GROUP_REC_ID_IT_KNOWLEDGE; the whole string must be the placeholder
+PLACEHOLDER_RE = re.compile(r"<([^<>]+)>")
+
+Keys = Tuple[Any, ...]   # path from the root as dict keys / list indexes
+
+
+def placeholder_key(v) -> str | None:
+    # cheap first/last char test before the regex, almost every string in a bundle fails it
+    if isinstance(v, str) and len(v) > 2 and v[0] == "<" and v[-1] == ">":
+        m = PLACEHOLDER_RE.fullmatch(v)
+        if m:
+            return m.group(1)
+    return None
+
+
+def scan(root) -> List[Tuple[Keys, str, str]]:
+    """
+    Iterative pre-order walk (same order the old recursive helpers visited nodes, no recursion limit).
+    Returns [(keys, placeholder, key)]; the key path is kept as one shared list and only copied for hits.
+    """
+    hits = []
+    path: List[Any] = []
+    stack = [(root, 0, None)]
+    while stack:
+        v, depth, k = stack.pop()
+        if depth:
+            del path[depth - 1:]
+            path.append(k)
+
+        if isinstance(v, dict):
+            items = reversed(v.items())
+        elif isinstance(v, list):
+            items = zip(range(len(v) - 1, -1, -1), reversed(v))
+        else:
+            key = placeholder_key(v)
+            if key is not None:
+                hits.append((tuple(path), v, key))
+            continue
+
+        # only containers and "<..." strings are worth a stack entry; the other scalars can't be hits
+        d = depth + 1
+        for ck, c in items:
+            if isinstance(c, (dict, list)) or (isinstance(c, str) and c[:1] == "<"):
+                stack.append((c, d, ck))
+    return hits
+
+
+def format_path(keys: Keys, base: str = "$") -> str:
+    return base + "".join(f"[{k}]" if isinstance(k, int) else f".{k}" for k in keys)
+
+
+def copy_paths(root, paths: List[Keys]):
+    """Copy-on-write: shallow-copy only the containers on the way to each path, share everything else."""
+    if not paths or not isinstance(root, (dict, list)):
+        return root
+    new_root = root.copy()
+    copied = {id(new_root)}
+    for keys in paths:
+        node = new_root
+        for k in keys[:-1]:
+            child = node[k]
+            if id(child) not in copied:
+                child = child.copy()
+                copied.add(id(child))
+                node[k] = child
+            node = child
+    return new_root
+
+
+def set_at(root, keys: Keys, value):
+    if not keys:
+        return value
+    node = root
+    for k in keys[:-1]:
+        node = node[k]
+    node[keys[-1]] = value
+    return root
+
+
+def resolve(root, mapping: Dict[str, Any], audit: List[Dict[str, Any]], path: str = "$", in_place: bool = False):
+    """
+    Replace every mapped placeholder and audit every placeholder (mapped or not) in one walk.
+    in_place=False leaves root untouched and returns a copy-on-write result that shares unchanged subtrees.
+    """
+    hits = scan(root)
+    if not in_place:
+        root = copy_paths(root, [keys for keys, _, key in hits if key in mapping and keys])
+
+    for keys, old, key in hits:
+        where = format_path(keys, path)
+        if key in mapping:
+            root = set_at(root, keys, mapping[key])
+            audit.append({"path": where, "old": old, "new": mapping[key]})
+        else:
+            audit.append({"path": where, "old": old, "new": None, "warning": "unmapped_placeholder"})
+    return root
+
+
+
+
+class PlaceholderPlan:
+    """
+    Compile once, render many: the bundle is scanned a single time and each render only patches the
+    recorded slots, so N tenants cost O(N x placeholders) instead of O(N x document size).
+    The bundle must not be mutated between compile and render.
+    """
+    __slots__ = ("root", "hits", "paths", "_json_parts", "_json_opts")
+
+    def __init__(self, root, path: str = "$"):
+        self.root = root
+        self.hits = scan(root)
+        self.paths = [format_path(keys, path) for keys, _, _ in self.hits]
+        self._json_parts = None
+        self._json_opts = None
+
+    def _audit(self, mapping, audit):
+        if audit is None:
+            return
+        for where, (_, old, key) in zip(self.paths, self.hits):
+            if key in mapping:
+                audit.append({"path": where, "old": old, "new": mapping[key]})
+            else:
+                audit.append({"path": where, "old": old, "new": None, "warning": "unmapped_placeholder"})
+
+    def render(self, mapping: Dict[str, Any], audit: List[Dict[str, Any]] | None = None):
+        """Same result and audit as resolve(root, mapping, audit); unchanged subtrees are shared with root."""
+        mapped = [(keys, key) for keys, _, key in self.hits if key in mapping]
+        out = copy_paths(self.root, [keys for keys, _ in mapped if keys])
+        for keys, key in mapped:
+            out = set_at(out, keys, mapping[key])
+        self._audit(mapping, audit)
+        return out
+
+    def render_json(self, mapping: Dict[str, Any], audit: List[Dict[str, Any]] | None = None,
+                    ensure_ascii: bool = False, indent: int | None = 2) -> str:
+        """
+        Serialized output without building the rendered object: the document is dumped once with a
+        sentinel in every slot, later renders just join the fixed text around the json-encoded values.
+        """
+        opts = (ensure_ascii, indent)
+        if self._json_parts is None or self._json_opts != opts:
+            sentinels = {keys: f"\u0000PH{i}\u0000" for i, (keys, _, _) in enumerate(self.hits)}
+            marked = copy_paths(self.root, [keys for keys in sentinels if keys])
+            for keys, mark in sentinels.items():
+                marked = set_at(marked, keys, mark)
+            text = json.dumps(marked, ensure_ascii=ensure_ascii, indent=indent)
+            # dumped sentinels are '"\u0000PH<i>\u0000"' (json escapes NUL), split around them
+            self._json_parts = re.split(r'"\\u0000PH\d+\\u0000"', text)
+            self._json_opts = opts
+
+        chunks = [self._json_parts[0]]
+        for (_, old, key), tail in zip(self.hits, self._json_parts[1:]):
+            chunks.append(json.dumps(mapping[key] if key in mapping else old, ensure_ascii=ensure_ascii))
+            chunks.append(tail)
+        self._audit(mapping, audit)
+        return "".join(chunks)
@@ -0,0 +1,138 @@
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from expressions import semantic_key
+
+# BRD-specific form rules live in a rule file (validation_rules.json by default) instead of code.
+# A rule file is compiled once into dispatch tables keyed by internal_name / field_type, so checking a
+# form is one pass over its fields whatever the number of rules.
+#
+# Rule shape:
+#   {"match": {"internal_name": "employee_id"} | {"field_type": "combo"},
+#    "check": "expr_equals" | "not_empty",         # expr_equals compares parsed expressions
+#    "attr": "<field attribute>",
+#    "value": "<expected Ivanti expression>",      # expr_equals only
+#    "allow_empty": false,                         # expr_equals: an empty attribute passes
+#    "scope": "field" | "form",                    # form: reported once after all fields, at form.fields(<name>)
+#    "severity": "warn" | "error",
+#    "message": "..."}
+
+DEFAULT_RULES_PATH = Path(__file__).with_name("validation_rules.json")
+
+_WS_RE = re.compile(r"\s+")
+_OPEN_RE = re.compile(r"\$\(\s*")
+_CLOSE_RE = re.compile(r"\s*\)")
+
+
+@lru_cache(maxsize=4096)
+def _norm_str(s: str) -> str:
+    t = s.strip()
+    t = _WS_RE.sub(" ", t)      # collapse runs of spaces
+    t = _OPEN_RE.sub("$(", t)   # strip space after $(
+    t = _CLOSE_RE.sub(")", t)   # strip space before )
+    return t
+
+
+def norm_expr(s: Any) -> str:
+    """Collapse whitespace inside Ivanti $( ...) expressions so formatting differences don't false-flag."""
+    if not isinstance(s, str):
+        return ""
+    return _norm_str(s)
+
+
+class RuleError(Exception):
+    pass
+
+
+class CompiledRule:
+    __slots__ = ("order", "scope", "attr", "test", "severity", "message")
+
+    def __init__(self, order: int, scope: str, attr: str, test: Callable[[Any], bool], severity: str, message: str):
+        self.order = order          # position in the rule file, keeps report order stable
+        self.scope = scope
+        self.attr = attr
+        self.test = test            # value -> True when the rule is satisfied
+        self.severity = severity
+        self.message = message
+
+
+class RuleSet:
+    __slots__ = ("by_name", "by_type", "source")
+
+    def __init__(self, source: str = ""):
+        self.by_name: Dict[str, List[CompiledRule]] = {}
+        self.by_type: Dict[str, List[CompiledRule]] = {}
+        self.source = source
+
+    def for_field(self, name: Any, ftype: Any) -> Tuple[CompiledRule, ...]:
+        a = self.by_name.get(name, ()) if isinstance(name, str) else ()
+        b = self.by_type.get(ftype, ()) if isinstance(ftype, str) else ()
+        return tuple(a) + tuple(b) if b else tuple(a)
+
+
+def _compile_test(rule: Dict[str, Any], where: str) -> Callable[[Any], bool]:
+    check = rule.get("check")
+    if check == "expr_equals":
+        if not isinstance(rule.get("value"), str):
+            raise RuleError(f"{where}: expr_equals needs a string 'value'")
+        want = semantic_key(rule["value"])       # parsed once, here; see expressions.semantic_key
+
+        def same(v: Any) -> bool:
+            try:
+                return semantic_key(v) == want
+            except TypeError:   # list / dict value
+                return False
+
+        if rule.get("allow_empty"):
+            return lambda v: not norm_expr(v) or same(v)
+        return same
+    if check == "not_empty":
+        return lambda v: bool(v)
+    raise RuleError(f"{where}: unknown check {check!r}")
+
+
+def compile_rules(spec: Dict[str, Any], source: str = "") -> RuleSet:
+    rs = RuleSet(source)
+    for i, rule in enumerate(spec.get("field_rules", [])):
+        where = f"{source or 'rules'}.field_rules[{i}]"
+        match = rule.get("match") or {}
+        if not rule.get("attr"):
+            raise RuleError(f"{where}: missing 'attr'")
+        scope = rule.get("scope", "field")
+        if scope not in ("field", "form"):
+            raise RuleError(f"{where}: scope must be field|form")
+
+        compiled = CompiledRule(i, scope, rule["attr"], _compile_test(rule, where),
+                                rule.get("severity", "warn"), rule.get("message", f"Rule {i} failed"))
+        if "internal_name" in match:
+            rs.by_name.setdefault(match["internal_name"], []).append(compiled)
+        elif "field_type" in match:
+            rs.by_type.setdefault(match["field_type"], []).append(compiled)
+        else:
+            raise RuleError(f"{where}: match needs internal_name or field_type")
+    return rs
+
+
+def load_rules(path: str | Path) -> RuleSet:
+    """Compile a JSON rule file (or YAML, when PyYAML is installed)."""
+    path = Path(path)
+    text = path.read_text(encoding="utf-8")
+    if path.suffix.lower() in (".yaml", ".yml"):
+        import yaml
+        spec = yaml.safe_load(text)
+    else:
+        spec = json.loads(text)
+    return compile_rules(spec or {}, path.name)
+
+
+_default = None
+
+
+def default_rules() -> RuleSet:
+    global _default
+    if _default is None:
+        _default = load_rules(DEFAULT_RULES_PATH)
+    return _default
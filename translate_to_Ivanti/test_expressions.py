@@ -0,0 +1,37 @@
+import expressions
+from model import Form
+from validators import validate_form
+
+
+def test_bool_compare_of_flattened_and_or():
+    # (a && b) canonicalizes to an ("all", ...) node; negating it must not re-canonicalize
+    neg = expressions.semantic_key("$( !(a && b) )")
+    assert expressions.semantic_key("$( (a && b) == false )") == neg
+    assert expressions.semantic_key("$( (a && b) != true )") == neg
+    assert expressions.semantic_key("$( (a || b) == true )") == expressions.semantic_key("$( b || a )")
+    assert expressions.semantic_key("$( !a == false )") == expressions.semantic_key("$( a )")
+
+
+def test_word_operators_are_case_insensitive():
+    assert expressions.equivalent("$( a AND b )", "$( a && b )")
+    assert expressions.equivalent("$( a Or NOT b )", "$( a || !b )")
+    assert expressions.references("$( a AND b )") == {"a", "b"}
+
+
+def test_validate_form_with_negated_group():
+    # employee_id has an expr_equals rule, so its required_expression goes through semantic_key
+    form = Form.from_dict({"fields": [
+        {"internal_name": "a", "field_type": "checkbox"},
+        {"internal_name": "b", "field_type": "checkbox"},
+        {"internal_name": "employee_id", "field_type": "text", "required_expression": "$( (a && b) == false )"},
+    ]})
+    issues = validate_form(form)
+    assert any(i["message"].startswith("Expected required_expression") for i in issues)
+
+
+def test_unparsed_expression_is_a_warning():
+    form = Form.from_dict({"fields": [
+        {"internal_name": "a", "field_type": "text", "visibility_expression": "$( CurrentUser().LoginID )"},
+    ]})
+    issues = [i for i in validate_form(form) if "does not parse" in i["message"]]
+    assert issues and all(i["severity"] == "warn" for i in issues)
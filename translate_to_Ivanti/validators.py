@@ -1,5 +1,9 @@
+from operator import attrgetter
 from typing import Any, Dict, List, Set, Tuple
-import re
+from expressions import EXPR_ATTRS, ExprError, dependency_cycles, is_expression, references
+from model import Bundle, Form, FormField, Offering, Workflow
+from rules import RuleSet, default_rules, norm_expr
+from workflow_graph import WorkflowIndex
 
 ALLOWED_FIELD_TYPES = {
     "checkbox", "combo", "text", "textarea", "fileupload",
@@ -20,18 +24,20 @@ REQUIRED_OFFERING_KEYS = {
 def issue(sev: str, where: str, msg: str) -> Dict[str, str]:
     return {"severity": sev, "where": where, "message": msg}
 
-def _norm_expr(s: str | None) -> str:
-    """Collapse whitespace inside Ivanti $( ...) expressions so formatting differences don't false-flag."""
-    if not isinstance(s, str):
-        return ""
-    t = s.strip()
-    t = re.sub(r"\s+", " ", t)              # collapse runs of spaces
-    t = re.sub(r"\$\(\s*", "$(", t)         # strip space after $(
-    t = re.sub(r"\s*\)", ")", t)            # strip space before )
-    return t
+_norm_expr = norm_expr   # kept for callers of the old name
 
 
-def validate_offering(offering: Dict[str, Any]) -> List[Dict[str, str]]:
+# The validators read records with get() / `in`, which raw JSON dicts and the typed model (model.py)
+# both support: one-shot callers pass dicts straight through without building the model, and
+# long-running callers parse once with Bundle.from_json and call validate_bundle.
+
+def _require_objects(items: List[Any], what: str) -> None:
+    for i, x in enumerate(items, 1):
+        if not hasattr(x, "get"):
+            raise ValueError(f"{what}[{i}] must be a JSON object, got {type(x).__name__}")
+
+
+def validate_offering(offering: Dict[str, Any] | Offering) -> List[Dict[str, str]]:
     issues: List[Dict[str, str]] = []
 
     
@@ -74,11 +80,25 @@ def validate_offering(offering: Dict[str, Any]) -> List[Dict[str, str]]:
 
 
 
-def collect_field_names(fields: List[Dict[str, Any]]) -> Tuple[Set[str], List[Dict[str, str]]]:
+_typed_exprs = attrgetter(*EXPR_ATTRS)
+
+
+def _field_names(fields: List[Dict[str, Any]] | List[FormField]) -> List[Any]:
+    try:
+        return [f.internal_name if isinstance(f, FormField) else f.get("internal_name") for f in fields]
+    except AttributeError:
+        _require_objects(fields, "form.fields")
+        raise
+
+
+def collect_field_names(fields: List[Dict[str, Any]] | List[FormField]) -> Tuple[Set[str], List[Dict[str, str]]]:
+    return _collect_names(_field_names(fields))
+
+
+def _collect_names(field_names: List[Any]) -> Tuple[Set[str], List[Dict[str, str]]]:
     issues: List[Dict[str, str]] = []
     names: Set[str] = set()
-    for idx, f in enumerate(fields, 1):
-        name = f.get("internal_name")
+    for idx, name in enumerate(field_names, 1):
         if not name or not isinstance(name, str):
             issues.append(issue("error", f"form.fields[{idx}]", "Field missing valid internal_name"))
             continue
@@ -89,101 +109,135 @@ def collect_field_names(fields: List[Dict[str, Any]]) -> Tuple[Set[str], List[Di
 
 
 
-def check_field(field: Dict[str, Any], idx: int, known_names: Set[str]) -> List[Dict[str, str]]:
+def check_field(field: Dict[str, Any] | FormField, idx: int, known_names: Set[str],
+                rules: RuleSet | None = None) -> List[Dict[str, str]]:
+    return _check_field(field, idx, known_names, rules or default_rules(), None, None)
+
+
+def _check_field(field: Dict[str, Any] | FormField, idx: int, known_names: Set[str], rules: RuleSet,
+                 form_hits: List[Tuple[int, Dict[str, str]]] | None,
+                 deps: Dict[str, Set[str]] | None) -> List[Dict[str, str]]:
     issues: List[Dict[str, str]] = []
-    where = f"form.fields[{idx}]({field.get('internal_name','?')})"
+    if isinstance(field, FormField):   # attribute reads; the dict path below avoids building records
+        keys = field.order
+        name, ftype, required, read_only, options = (
+            field.internal_name, field.field_type, field.required, field.read_only, field.options)
+        exprs = _typed_exprs(field)
+    else:
+        keys = field
+        name, ftype, required, read_only, options = (
+            field.get("internal_name"), field.get("field_type"), field.get("required"),
+            field.get("read_only"), field.get("options"))
+        exprs = tuple(map(field.get, EXPR_ATTRS))
+    where = f"form.fields[{idx}]({name if 'internal_name' in keys else '?'})"
 
-    ftype = field.get("field_type")
     if ftype not in ALLOWED_FIELD_TYPES:
         issues.append(issue("error", where, f"Unsupported field_type: {ftype}"))
 
-    if "required" in field and not isinstance(field["required"], bool):
+    if "required" in keys and not isinstance(required, bool):
         issues.append(issue("error", where, "required must be boolean"))
-    if "read_only" in field and not isinstance(field["read_only"], bool):
+    if "read_only" in keys and not isinstance(read_only, bool):
         issues.append(issue("error", where, "read_only must be boolean"))
 
-    if ftype == "combo" and field.get("options") is not None and not isinstance(field["options"], list):
+    if ftype == "combo" and options is not None and not isinstance(options, list):
         issues.append(issue("error", where, "combo field 'options' must be a list"))
 
-    if field.get("required") is True and field.get("required_expression"):
+    if required is True and exprs[0]:
         issues.append(issue("warn", where, "Avoid required=true when required_expression is present"))
 
-
-    # Check BRD rules:
-    if field.get("internal_name") == "employee_id":
-        want = _norm_expr("$( submit_on_behalf == true )")
-        req_expr = _norm_expr(field.get("required_expression"))
-        vis_expr = _norm_expr(field.get("visibility_expression"))
-        if req_expr != want:
-            issues.append(issue("warn", where, "Expected required_expression: $( submit_on_behalf == true )"))
-        if vis_expr != want:
-            issues.append(issue("warn", where, "Expected visibility_expression: $( submit_on_behalf == true )"))
-
-
-    if field.get("internal_name") == "domain_name":
-        vis_expr = _norm_expr(field.get("visibility_expression"))
-        if vis_expr and vis_expr != _norm_expr("$(false)"):
-            issues.append(issue("warn", where, "domain_name should be hidden; set visibility_expression to $(false)"))
+    # $( ... ) expressions: parsed once per distinct string (expressions.parse is memoized)
+    for attr, expr in zip(EXPR_ATTRS, exprs):
+        if not expr or not is_expression(expr):
+            continue
+        try:
+            refs = references(expr)
+        except ExprError as e:
+            # warn only: Ivanti accepts syntax this parser doesn't cover (if/then/else, member access, indexing)
+            issues.append(issue("warn", where, f"{attr} does not parse: {e}"))
+            continue
+        unknown = refs - known_names
+        if unknown:
+            issues.append(issue("warn", where, f"{attr} references unknown field(s): {', '.join(sorted(unknown))}"))
+        if deps is not None and refs:
+            deps.setdefault(name, set()).update(refs - unknown)
+
+    # BRD rules from the rule file (validation_rules.json), already compiled into a dispatch table
+    for rule in rules.for_field(name, ftype):
+        if rule.scope == "form":
+            if form_hits is not None and not rule.test(field.get(rule.attr)):
+                form_hits.append((rule.order, issue(rule.severity, f"form.fields({name})", rule.message)))
+        elif not rule.test(field.get(rule.attr)):
+            issues.append(issue(rule.severity, where, rule.message))
 
     return issues
 
 
 
 
-def validate_form(form: Dict[str, Any]) -> List[Dict[str, str]]:
+def validate_form(form: Dict[str, Any] | Form, rules: RuleSet | None = None) -> List[Dict[str, str]]:
     issues: List[Dict[str, str]] = []
-    fields = form.get("fields")
+    typed = isinstance(form, Form)
+    fields = form.fields if typed else form.get("fields")
     if not isinstance(fields, list):
         return [issue("error", "form.fields", "fields must be a list")]
 
-    names, name_issues = collect_field_names(fields)
+    field_names = _field_names(fields)
+    names, name_issues = _collect_names(field_names)
     issues.extend(name_issues)
 
 
-    seqs = [f.get("sequence_number") for f in fields]
+    seqs = [f.sequence_number for f in fields] if typed else [f.get("sequence_number") for f in fields]
     if all(isinstance(x, int) for x in seqs):
         if sorted(seqs) != list(range(1, len(fields) + 1)):
             issues.append(issue("warn", "form.fields.sequence_number", "Sequence numbers should be 1..N contiguous"))
 
-    for idx, f in enumerate(fields, 1):
-        issues.extend(check_field(f, idx, names))
-
-
-    for want, hint in (
-        ("phone_number", "CurrentUser('Phone')"),
-        ("extension",    "CurrentUser('Extension')"),
-    ):
-        fld = next((x for x in fields if x.get("internal_name") == want), None)
-        if fld and not fld.get("auto_fill_expression"):
-            issues.append(issue("warn", f"form.fields({want})",
-                                f"Consider auto_fill_expression for {want} (e.g., {hint})"))
+    rules = rules or default_rules()
+    form_hits: List[Tuple[int, Dict[str, str]]] = []
+    deps: Dict[str, Set[str]] = {}   # field -> fields its expressions read
+    seen: Set[str] = set()
+    for idx, (f, name) in enumerate(zip(fields, field_names), 1):
+        # form-scope rules (e.g. auto-fill hints) and the dependency graph only look at the first field with a given name
+        first = isinstance(name, str) and name not in seen
+        if first:
+            seen.add(name)
+        issues.extend(_check_field(f, idx, names, rules, form_hits if first else None, deps if first else None))
+
+    for frm, to in dependency_cycles(deps):
+        issues.append(issue("error", f"form.fields({frm})", f"Expression dependency cycle through {frm} -> {to}"))
+
+    issues.extend(i for _, i in sorted(form_hits, key=lambda h: h[0]))
     return issues
 
 
 
 
-def validate_workflow(workflow: Dict[str, Any]) -> List[Dict[str, str]]:
+def validate_workflow(workflow: Dict[str, Any] | Workflow, index: WorkflowIndex | None = None) -> List[Dict[str, str]]:
     issues: List[Dict[str, str]] = []
-    blocks = workflow.get("blocks")
-    links  = workflow.get("links")
+    typed = isinstance(workflow, Workflow)
+    blocks = workflow.blocks if typed else workflow.get("blocks")
+    links  = workflow.links if typed else workflow.get("links")
 
     if not isinstance(blocks, list) or not isinstance(links, list):
         return [issue("error", "workflow", "blocks and links must be lists")]
+    _require_objects(blocks, "workflow.blocks")
+    _require_objects(links, "workflow.links")
 
-    ids: Set[str] = set()
+    if index is not None:
+        idx = index   # shared with mapping.check_links; it must be built over these same blocks
+    else:
+        idx = workflow.index if typed else WorkflowIndex(blocks, links)
     start_count = 0
     stop_count  = 0
 
     for i, b in enumerate(blocks, 1):
-        bid = b.get("id")
+        bid = b.id if typed else b.get("id")
         if not bid or not isinstance(bid, str):
             issues.append(issue("error", f"workflow.blocks[{i}]", "Missing/invalid id"))
             continue
-        if bid in ids:
+        if not idx.is_first(b):
             issues.append(issue("error", f"workflow.blocks[{i}]", f"Duplicate block id: {bid}"))
-        ids.add(bid)
 
-        btype = b.get("type")
+        btype = b.type if typed else b.get("type")
         if btype not in ALLOWED_BLOCK_TYPES:
             issues.append(issue("error", f"workflow.blocks[{i}]", f"Unknown block type: {btype}"))
         if btype == "start": start_count += 1
@@ -191,7 +245,7 @@ def validate_workflow(workflow: Dict[str, Any]) -> List[Dict[str, str]]:
 
 
         if btype == "vote0007":
-            props = b.get("properties", {}) or {}
+            props = (b.properties if typed else b.get("properties")) or {}
             appr = props.get("approvers", {}) or {}
             mode = appr.get("mode")
             if mode == "group":
@@ -210,14 +264,27 @@ def validate_workflow(workflow: Dict[str, Any]) -> List[Dict[str, str]]:
 
 
     for i, l in enumerate(links, 1):
-        frm = l.get("from"); to = l.get("to")
-        if frm not in ids:
+        frm, to = (l.from_, l.to) if typed else (l.get("from"), l.get("to"))
+        if not idx.has(frm):
             issues.append(issue("error", f"workflow.links[{i}]", f"Unknown from id: {frm}"))
-        if to not in ids:
+        if not idx.has(to):
             issues.append(issue("error", f"workflow.links[{i}]", f"Unknown to id: {to}"))
 
-
-    sts = workflow.get("status_transitions", [])
+    # graph shape: WORKFLOW_SYS asks for every path reachable from start, acyclic, and ending in a stop block
+    g = idx.report()
+    for bid in g.unreachable:
+        issues.append(issue("warn", f"workflow.blocks({bid})", "Block is not reachable from start"))
+    for frm, to in g.cycles:
+        issues.append(issue("error", f"workflow.links({frm}->{to})", "Link closes a cycle"))
+    for bid in g.dead_ends:
+        issues.append(issue("error", f"workflow.blocks({bid})", "No path from this block to a stop block"))
+    for bid, ex in g.vote_exits_unlinked:
+        issues.append(issue("warn", f"workflow.blocks({bid})", f"vote0007 exit '{ex}' has no link"))
+    for bid, ex in g.duplicate_exits:
+        issues.append(issue("error", f"workflow.blocks({bid})", f"Exit '{ex}' is linked more than once"))
+
+
+    sts = (workflow.status_transitions if typed else workflow.get("status_transitions")) or []
     if sts and not isinstance(sts, list):
         issues.append(issue("error", "workflow.status_transitions", "Must be a list"))
     else:
@@ -227,7 +294,7 @@ def validate_workflow(workflow: Dict[str, Any]) -> List[Dict[str, str]]:
                     issues.append(issue("error", f"workflow.status_transitions[{j}]", f"Missing '{k}'"))
 
 
-    for i, n in enumerate(workflow.get("notifications", []), 1):
+    for i, n in enumerate(workflow.notifications if typed else workflow.get("notifications", []), 1):
         tmpl = n.get("template")
         if isinstance(tmpl, str) and tmpl.startswith("<") and ">" in tmpl:
             issues.append(issue("warn", f"workflow.notifications[{i}]",
@@ -260,15 +327,25 @@ def validate_tenant_config(cfg: Dict[str, Any]) -> List[Dict[str, str]]:
 
 
 
+def validate_bundle(bundle: Bundle, tenant_cfg: Dict[str, Any], rules: RuleSet | None = None) -> List[Dict[str, str]]:
+    issues: List[Dict[str, str]] = []
+    issues += validate_offering(bundle.offering)
+    issues += validate_form(bundle.form, rules)
+    issues += validate_workflow(bundle.workflow)
+    issues += validate_tenant_config(tenant_cfg)
+    return issues
+
+
 def validate_all(
     offering: Dict[str, Any],
     form: Dict[str, Any],
     workflow: Dict[str, Any],
     tenant_cfg: Dict[str, Any],
+    rules: RuleSet | None = None,
 ) -> List[Dict[str, str]]:
     issues: List[Dict[str, str]] = []
     issues += validate_offering(offering)
-    issues += validate_form(form)
+    issues += validate_form(form, rules)
     issues += validate_workflow(workflow)
     issues += validate_tenant_config(tenant_cfg)
     return issues
@@ -0,0 +1,141 @@
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Set, Tuple
+
+from loaders import LoadError, _check_form, _check_workflow, load_tenant_config, read_json
+from model import Form, Offering, Workflow
+from rules import DEFAULT_RULES_PATH, RuleError, load_rules
+from validators import issue, validate_form, validate_offering, validate_tenant_config, validate_workflow
+
+# Watch mode for hand-editing a bundle: the parsed parts and their issues stay in memory, files are
+# polled on (mtime_ns, size), and a change re-parses only that file and re-runs only its validator.
+# A rule file change re-runs validate_form. Each round prints the issue diff since the previous one.
+
+PARTS = {   # part -> file name inside the bundle folder
+    "offering": "offering_info.json",
+    "form": "form.json",
+    "workflow": "workflow_logic.json",
+    "tenant": "tenant_config.json",
+}
+
+IssueKey = Tuple[str, str, str]
+
+
+def _key(i: Dict[str, str]) -> IssueKey:
+    return i["severity"], i["where"], i["message"]
+
+
+class BundleWatcher:
+    def __init__(self, base: str | Path, rules_path: str | Path = DEFAULT_RULES_PATH):
+        self.base = Path(base)
+        self.paths = {part: self.base / name for part, name in PARTS.items()}
+        self.paths["rules"] = Path(rules_path)
+        self.stamps: Dict[str, Tuple[int, int] | None] = {}
+        self.parsed: Dict[str, Any] = {}
+        self.issues: Dict[str, List[Dict[str, str]]] = {part: [] for part in PARTS}
+        self.rules = None
+
+    def _stamp(self, part: str):
+        try:
+            st = self.paths[part].stat()
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def changed(self) -> Set[str]:
+        out = set()
+        for part in self.paths:
+            stamp = self._stamp(part)
+            if stamp != self.stamps.get(part, ()):
+                self.stamps[part] = stamp
+                out.add(part)
+        return out
+
+    def _load(self, part: str):
+        path = self.paths[part]
+        if part == "tenant":
+            return load_tenant_config(path, cached=True)
+        data = read_json(path, cached=True)   # loaders' cache re-parses only when (mtime, size) moved
+        if part == "offering":
+            return Offering.from_dict(data)
+        if part == "form":
+            _check_form(data)
+            return Form.from_dict(data)
+        _check_workflow(data)
+        return Workflow.from_dict(data)
+
+    def _validate(self, part: str) -> List[Dict[str, str]]:
+        value = self.parsed[part]
+        if part == "offering":
+            return validate_offering(value)
+        if part == "form":
+            return validate_form(value, self.rules)
+        if part == "workflow":
+            return validate_workflow(value)
+        return validate_tenant_config(value)
+
+    def refresh(self, changed: Set[str]) -> Set[str]:
+        """Re-parse the changed files and re-validate the parts they affect; returns those parts."""
+        todo = {p for p in changed if p in PARTS}
+        if "rules" in changed:
+            try:
+                self.rules = load_rules(self.paths["rules"])
+            except (OSError, ValueError, RuleError) as e:
+                self.rules = None   # fall back to the default rules until the file is fixed
+                print(f"[rules] {e}")
+            todo.add("form")
+
+        for part in todo:
+            if part in changed or part not in self.parsed:
+                try:
+                    self.parsed[part] = self._load(part)
+                except (LoadError, ValueError) as e:
+                    self.parsed.pop(part, None)
+                    self.issues[part] = [issue("error", PARTS[part], str(e))]
+                    continue
+            if part in self.parsed:
+                self.issues[part] = self._validate(part)
+        return todo
+
+    def all_issues(self) -> List[Dict[str, str]]:
+        return [i for part in PARTS for i in self.issues[part]]
+
+
+def diff(before: List[Dict[str, str]], after: List[Dict[str, str]]):
+    old = {_key(i) for i in before}
+    new = {_key(i) for i in after}
+    added = [i for i in after if _key(i) not in old]
+    removed = [i for i in before if _key(i) not in new]
+    return added, removed
+
+
+def watch(base: str | Path = "structured", interval: float = 0.5, rules_path: str | Path = DEFAULT_RULES_PATH):
+    w = BundleWatcher(base, rules_path)
+    w.refresh(w.changed())
+    current = w.all_issues()
+    for i in current:
+        print(f"[{i['severity']}] {i['where']}: {i['message']}")
+    print(f"\n Watching {w.base} ({len(current)} issues). Ctrl+C to stop.")
+
+    try:
+        while True:
+            time.sleep(interval)
+            changed = w.changed()
+            if not changed:
+                continue
+            start = time.perf_counter()
+            parts = w.refresh(changed)
+            after = w.all_issues()
+            added, removed = diff(current, after)
+            ms = (time.perf_counter() - start) * 1e3
+            print(f"\n {', '.join(sorted(changed))} changed -> re-validated {', '.join(sorted(parts))} in {ms:.1f} ms")
+            for i in removed:
+                print(f"  - [{i['severity']}] {i['where']}: {i['message']}")
+            for i in added:
+                print(f"  + [{i['severity']}] {i['where']}: {i['message']}")
+            if not added and not removed:
+                print("  (no change in issues)")
+            print(f"  {len(after)} issues")
+            current = after
+    except KeyboardInterrupt:
+        pass
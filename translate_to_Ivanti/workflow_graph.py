@@ -0,0 +1,150 @@
+from collections import deque
+from typing import Any, Dict, List, Tuple
+
+VOTE_EXITS = ("approved", "denied", "cancelled", "timedout", "noapprovers")
+
+
+# One pass over blocks + links, shared by validators.validate_workflow and mapping.check_links,
+# so neither of them re-scans the block list per block/link.
+class WorkflowIndex:
+    __slots__ = ("blocks", "links", "by_id", "out", "order", "succ", "_report")
+
+    def __init__(self, blocks: List[Dict[str, Any]], links: List[Dict[str, Any]]):
+        self.blocks = blocks
+        self.links = links
+        self._report = None
+
+        # locals and dense lists in the loops: these run once per block / link on every index build
+        by_id: Dict[str, Dict[str, Any]] = {}   # first block for each id
+        order: Dict[str, int] = {}              # block id -> dense int, used by the graph walks
+        for b in blocks:
+            bid = b.get("id") if hasattr(b, "get") else None   # dicts or model.Block
+            if isinstance(bid, str) and bid and bid not in by_id:
+                by_id[bid] = b
+                order[bid] = len(order)
+
+        out: List[List[Dict[str, Any]]] = [[] for _ in order]
+        succ: List[List[int]] = [[] for _ in order]   # dense adjacency (only links whose both ends exist)
+        for L in links:
+            if not hasattr(L, "get"):
+                continue
+            u = order.get(L.get("from"))
+            if u is not None:
+                out[u].append(L)
+                v = order.get(L.get("to"))
+                if v is not None:
+                    succ[u].append(v)
+
+        self.by_id = by_id
+        self.order = order
+        self.succ = succ
+        self.out: Dict[str, List[Dict[str, Any]]] = dict(zip(order, out))   # block id -> outgoing links, known ids only
+
+    def has(self, bid) -> bool:
+        return isinstance(bid, str) and bid in self.by_id
+
+    def is_first(self, block) -> bool:
+        """False for the 2nd+ block that reuses an id."""
+        return self.by_id.get(block.get("id")) is block
+
+    def report(self) -> "GraphReport":
+        """Graph analysis, computed on first use and then shared by every caller holding this index."""
+        if self._report is None:
+            self._report = analyze(self)
+        return self._report
+
+
+def build_index(workflow: Dict[str, Any]) -> WorkflowIndex:
+    return WorkflowIndex(workflow.get("blocks") or [], workflow.get("links") or [])
+
+
+
+
+class GraphReport:
+    __slots__ = ("unreachable", "cycles", "dead_ends", "vote_exits_unlinked", "duplicate_exits")
+
+    def __init__(self):
+        self.unreachable: List[str] = []                      # not reachable from the start block
+        self.cycles: List[Tuple[str, str]] = []               # (from, to) of each link that closes a loop
+        self.dead_ends: List[str] = []                        # cannot reach any stop block
+        self.vote_exits_unlinked: List[Tuple[str, str]] = []  # (vote0007 id, exit title) with no link
+        self.duplicate_exits: List[Tuple[str, str]] = []      # (from, exit) wired more than once
+
+
+def _bfs(adj: List[List[int]], seeds: List[int]) -> List[bool]:
+    seen = [False] * len(adj)
+    q = deque(seeds)
+    for s in seeds:
+        seen[s] = True
+    while q:
+        u = q.popleft()
+        for v in adj[u]:
+            if not seen[v]:
+                seen[v] = True
+                q.append(v)
+    return seen
+
+
+def _back_edges(succ: List[List[int]]) -> List[Tuple[int, int]]:
+    # iterative DFS (no recursion limit on huge workflows); a link into a node still on the stack closes a cycle
+    WHITE, GRAY, BLACK = 0, 1, 2
+    color = [WHITE] * len(succ)
+    back = []
+    for root in range(len(succ)):
+        if color[root] != WHITE:
+            continue
+        color[root] = GRAY
+        stack = [(root, 0)]
+        while stack:
+            u, i = stack[-1]
+            if i < len(succ[u]):
+                stack[-1] = (u, i + 1)
+                v = succ[u][i]
+                if color[v] == WHITE:
+                    color[v] = GRAY
+                    stack.append((v, 0))
+                elif color[v] == GRAY:
+                    back.append((u, v))
+            else:
+                color[u] = BLACK
+                stack.pop()
+    return back
+
+
+def analyze(idx: WorkflowIndex) -> GraphReport:
+    """Reachability, cycles, dead ends and exit wiring in O(blocks + links)."""
+    r = GraphReport()
+    ids = list(idx.order)
+    types = [idx.by_id[b].get("type") for b in ids]
+
+    starts = [i for i, t in enumerate(types) if t == "start"]
+    if starts:
+        reach = _bfs(idx.succ, starts)
+        r.unreachable = [ids[i] for i, ok in enumerate(reach) if not ok]
+
+    stops = [i for i, t in enumerate(types) if t == "stop"]
+    if stops:   # with no stop block at all, the missing stop is the one error; every block would be a dead end
+        pred: List[List[int]] = [[] for _ in ids]
+        for u, vs in enumerate(idx.succ):
+            for v in vs:
+                pred[v].append(u)
+        to_stop = _bfs(pred, stops)
+        r.dead_ends = [ids[i] for i, ok in enumerate(to_stop) if not ok]
+
+    r.cycles = [(ids[u], ids[v]) for u, v in _back_edges(idx.succ)]
+
+    for (bid, links), btype in zip(idx.out.items(), types):   # out is in the same (order) sequence as ids
+        seen = set()
+        for L in links:
+            key = L.get("exit")
+            if key in seen:
+                r.duplicate_exits.append((bid, key))
+            seen.add(key)
+
+        if btype == "vote0007":
+            declared = [e.get("title") for e in (idx.by_id[bid].get("exits") or []) if isinstance(e, dict)]
+            for ex in (declared or VOTE_EXITS):
+                if ex not in seen:
+                    r.vote_exits_unlinked.append((bid, ex))
+
+    return r